@@ -1,7 +1,11 @@
-import librosa
-import numpy as np
+import os
+import sys
 import joblib
 
+# Shared feature pipeline lives in server/voice_classification
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+from voice_classification.features import AudioFeatures
+
 # Constants – these should match the settings used during training
 MAX_LEN = 130
 CUSTOM_THRESHOLD = 0.3  # Same custom threshold as in training
@@ -14,15 +18,8 @@ def extract_features(file_path, max_len=MAX_LEN):
     Pads or truncates the features to ensure a consistent shape.
     """
     try:
-        audio, sr = librosa.load(file_path, sr=None)
-        mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=40)
-        # Pad with zeros if the audio is too short, or truncate if too long
-        if mfcc.shape[1] < max_len:
-            pad_width = max_len - mfcc.shape[1]
-            mfcc = np.pad(mfcc, pad_width=((0, 0), (0, pad_width)), mode='constant')
-        else:
-            mfcc = mfcc[:, :max_len]
-        return mfcc
+        # Pads with zeros if the audio is too short, or truncates if too long
+        return AudioFeatures.from_file(file_path).mfcc_fixed(max_len)
     except Exception as e:
         print(f"Error processing {file_path}: {e}")
         return None
@@ -1,7 +1,11 @@
 # predict_sound.py
+import os
+import sys
 import joblib
-import librosa
-import numpy as np
+
+# Shared feature pipeline lives in server/voice_classification
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+from voice_classification.features import AudioFeatures
 
 # 🛠️ Set your WAV file path here
 file_path = 'silence.wav'
@@ -11,10 +15,7 @@ clf = joblib.load('sound_classifier.pkl')
 
 # Feature extraction function
 def extract_features(file_path):
-    y, sr = librosa.load(file_path, sr=None)
-    mel = librosa.feature.melspectrogram(y=y, sr=sr)
-    mel_db = librosa.power_to_db(mel, ref=np.max)
-    return np.mean(mel_db, axis=1)
+    return AudioFeatures.from_file(file_path).mel_db_mean
 
 # Run prediction
 try:
@@ -1,5 +1,14 @@
+import os
+import sys
+
+import numpy as np
+import torch
 from speechbrain.inference.speaker import SpeakerRecognition
 
+# Shared reference-embedding cache lives in server/voice_classification
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+from voice_classification.embedding_cache import ReferenceEmbedding
+
 threshold = 0.4
 pragyam_sample = "samples/pragyam_sample.wav"
 
@@ -8,7 +17,24 @@ recognizer = SpeakerRecognition.from_hparams(
     savedir="pretrained_models/spkrec-ecapa-voxceleb"
 )
 
+
+def embed_file(path):
+    signal = recognizer.load_audio(path)
+    with torch.no_grad():
+        embedding = recognizer.encode_batch(signal.unsqueeze(0))
+    embedding = embedding.squeeze().cpu().numpy().astype(np.float32)
+    return embedding / np.linalg.norm(embedding)
+
+
+# Whole file, no VAD: cached separately from the server's trimmed embeddings
+_reference = ReferenceEmbedding(embed_file, "full")
+
+
+def reference_embedding(path=pragyam_sample):
+    return _reference.get(path)
+
+
 def same_voice(voice_sample):
-    score, prediction = recognizer.verify_files(pragyam_sample, voice_sample)
-    print(f"Score: {score.item():.4f}")
-    return score.item() > threshold
+    score = float(np.dot(reference_embedding(), embed_file(voice_sample)))
+    print(f"Score: {score:.4f}")
+    return score > threshold
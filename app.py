@@ -1,23 +1,50 @@
 from flask import Flask, jsonify, render_template, request
 import joblib
-import librosa
-import numpy as np
 import os
+import threading
 from steganography.decoder import extract_ultrasonic_message
 from steganography.encoder import embed_ultrasonic_message
-from voice_classifier.voice_classifier import is_human
+from voice_classifier.features import AudioFeatures
+from voice_classifier.voice_classifier import classify
+from voice_classifier.voice_classifier import result_cache as voice_result_cache
+from voice_classifier.result_cache import ResultCache, bytes_hash
+from voice_classifier.sample_index import SampleIndex
 
 from flask import send_file
 import tempfile
 
 app = Flask(__name__)
-clf = joblib.load('sound_classifier/sound_classifier.pkl')
+# Paths are relative to this file, not to the directory the server starts in
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SOUND_CLASSIFIER_PATH = os.path.join(APP_DIR, 'sound_classifier', 'sound_classifier.pkl')
+_clf = None
+_clf_lock = threading.Lock()
+sound_result_cache = ResultCache("sound_classifier")
+# Features of the demo clips, computed once and kept up to date in the background
+SAMPLES_DIR = os.path.join(APP_DIR, "static", "samples")
+sample_index = SampleIndex(SAMPLES_DIR, index_path=os.path.join(APP_DIR, "sample_index.npz"))
+
+def get_sound_classifier():
+    # Unpickled on first use instead of at import, so startup stays fast
+    global _clf
+    if _clf is None:
+        with _clf_lock:
+            if _clf is None:
+                st = os.stat(SOUND_CLASSIFIER_PATH)
+                _clf = joblib.load(SOUND_CLASSIFIER_PATH)
+                sound_result_cache.set_version((st.st_mtime_ns, st.st_size))
+    return _clf
+
+def predict_background(content, features):
+    # Sound classifier prediction keyed by the audio's content hash;
+    # features is a callable so a cache hit skips decoding entirely
+    clf = get_sound_classifier()
+    cache_key = sound_result_cache.key(content)
+    return sound_result_cache.get_or_compute(
+        cache_key, lambda: str(clf.predict(features().reshape(1, -1))[0]))
 
 def extract_features(file_path):
-    y, sr = librosa.load(file_path, sr=None)
-    mel = librosa.feature.melspectrogram(y=y, sr=sr)
-    mel_db = librosa.power_to_db(mel, ref=np.max)
-    return np.mean(mel_db, axis=1)
+    return AudioFeatures.from_file(file_path).mel_db_mean
 
 @app.route('/')
 def index():
@@ -67,56 +94,66 @@ def classify_voice():
         return jsonify({'error': 'No audio file uploaded'}), 400
 
     audio = request.files['audio']
-    temp_path = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-    audio.save(temp_path.name)
 
     try:
-        # Use your existing logic
-
-        result = is_human(temp_path.name)
-        if result is None:
-            return jsonify({'error': 'Classification failed'}), 500
-
-        # Reload model to get probability too
-        from voice_classifier.voice_classifier import extract_features as extract_mfcc_features
-
-        model = joblib.load("voice_classifier/voice_classifier.pkl")
-        scaler = joblib.load("voice_classifier/scaler.pkl")
-        features = extract_mfcc_features(temp_path.name)
-
-        if features is None:
-            return jsonify({'error': 'Feature extraction failed'}), 500
-
-        features = features.reshape(1, -1)
-        features = scaler.transform(features)
-        proba = model.predict_proba(features)[0][1]  # AI confidence
-
-
-
-        label = "Human" if result else "AI"
-        return jsonify({'label': label, 'probability': f"{proba:.2f}"})
+        result = classify(audio.read())
+        return jsonify({
+            'label': result['label'],
+            'probability': f"{result['ai_probability']:.2f}",
+            'threshold': result['threshold'],
+            'cached': result['cached'],
+            'timings': result['timings'],
+        })
     except Exception as e:
         print(f"Voice classification error: {e}")
         return jsonify({'error': 'Server error'}), 500
-    finally:
-        os.remove(temp_path.name)
 
+@app.route('/analyze_audio', methods=['POST'])
+def analyze_audio():
+    # Deepfake and background-sound analysis from one decode and one STFT
+    if 'audio' not in request.files:
+        return jsonify({'error': 'No audio file uploaded'}), 400
+
+    try:
+        data = request.files['audio'].read()
+        features = AudioFeatures.from_bytes(data)
+        result = classify(features)
+        background = predict_background(bytes_hash(data), lambda: features.mel_db_mean)
+        return jsonify({
+            'label': result['label'],
+            'probability': f"{result['ai_probability']:.2f}",
+            'threshold': result['threshold'],
+            'background': background,
+            'timings': result['timings'],
+        })
+    except Exception as e:
+        print(f"Audio analysis error: {e}")
+        return jsonify({'error': 'Server error'}), 500
 
 @app.route('/predict_sample', methods=['POST'])
 def predict_sample():
     data = request.get_json()
     sample_name = data.get("sample")
-    file_path = os.path.join("static", "samples", sample_name)
-
-    if not os.path.exists(file_path):
-        return jsonify({"error": "Sample file not found."}), 404
 
     try:
-        features = extract_features(file_path).reshape(1, -1)
-        prediction = clf.predict(features)[0]
+        # Served from the index: no file access, decode or STFT per click
+        entry = sample_index.get(sample_name)
+        if entry is None:
+            return jsonify({"error": "Sample file not found."}), 404
+
+        prediction = predict_background(entry["hash"], lambda: entry["mel"])
         return jsonify({"prediction": prediction})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/metrics')
+def metrics():
+    return jsonify({'result_cache': {'voice_classifier': voice_result_cache.metrics(),
+                                     'sound_classifier': sound_result_cache.metrics()}})
+
 if __name__ == '__main__':
+    # Scan at startup rather than on the first /predict_sample. Importing the
+    # app (tests, benchmarks, other servers) starts no thread; get() then
+    # starts the watcher on first use.
+    sample_index.watch()
     app.run(debug=True)
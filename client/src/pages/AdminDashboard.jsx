@@ -20,6 +20,11 @@ export default function AdminDashboard() {
   const [verificationProgress, setVerificationProgress] = useState(0);
 
   useEffect(() => {
+    // Updates are only sent to clients in the admins room; (re)join on every connect
+    const joinDashboard = () => socket.emit('join_dashboard', { role: 'admin' });
+    if (socket.connected) joinDashboard();
+    socket.on('connect', joinDashboard);
+
     // Socket event listeners
     socket.on('verification_update', (data) => {
       const updatedStatus = {
@@ -44,6 +49,7 @@ export default function AdminDashboard() {
     // Cleanup on unmount
     return () => {
       socket.off('verification_update');
+      socket.off('connect', joinDashboard);
     };
   }, []);
 
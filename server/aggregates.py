@@ -0,0 +1,229 @@
+import atexit
+import collections
+import threading
+import time
+
+import db
+
+CHECKS = ('human_voice', 'matching_voice', 'matching_face')
+RETAIN_HOURS = 48  # hourly buckets kept in memory and served
+REFRESH_INTERVAL = 5.0  # seconds between checkpoints and re-reads of the summary tables
+
+
+def hour_of(timestamp):
+    return int(timestamp // 3600) * 3600
+
+
+def _counts():
+    return {check: [0, 0] for check in CHECKS}
+
+
+def _copy(counts):
+    return {check: list(pair) for check, pair in counts.items()}
+
+
+def _add(counts, delta):
+    for check, (passed, failed) in delta.items():
+        counts[check][0] += passed
+        counts[check][1] += failed
+
+
+def _format(counts):
+    return {
+        check: {
+            'passed': passed,
+            'failed': failed,
+            'pass_rate': passed / (passed + failed) if passed + failed else None,
+        }
+        for check, (passed, failed) in counts.items()
+    }
+
+
+class VerificationAggregates:
+    """
+    Running pass/fail counts of the voice and face checks, per hour and per
+    agent, updated in O(1) per submission.
+
+    Every `refresh_interval` a background thread writes the changes since
+    the last refresh to the verification_aggregates (per hour) and
+    verification_totals (all time, per agent) summary tables, as additive
+    upserts through the batched writer so several workers can add to the
+    same rows, then re-reads the retained hours and the per-agent totals.
+    Snapshots only combine that last read with this worker's submissions
+    since, in memory, so every worker converges on the same numbers and a
+    request never waits on the database.
+    """
+
+    def __init__(self, retain_hours=RETAIN_HOURS, refresh_interval=REFRESH_INTERVAL):
+        self.retain_hours = retain_hours
+        self.refresh_interval = refresh_interval  # None: no timer, call reload() yourself
+        self._lock = threading.Lock()
+        # Held while deltas move to the tables, so a reload sees all of this worker's
+        self._checkpoint_lock = threading.Lock()
+        self._loaded_at = None
+        self._base = (_counts(), {}, {})  # totals, by_hour, by_agent as of the last reload
+        self._recent = collections.defaultdict(_counts)  # (hour, agent_id) -> deltas since the reload
+        self._carry = {}  # deltas of the previous reload period until its table read is in
+        self._dirty = collections.defaultdict(_counts)  # (hour, agent_id) -> deltas to checkpoint
+        self._unsent = {'hours': {}, 'agents': {}}  # deltas not yet pushed to dashboards
+        self._thread = None
+
+    def _ensure_started(self):
+        # Started lazily so the thread is created in the process that serves
+        # requests, not in a parent that forks workers afterwards.
+        if self._thread is None and self.refresh_interval is not None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="aggregates", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        # Refreshes on a timer, so snapshots stay current and an idle
+        # worker's last submissions still reach the tables
+        while True:
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Aggregates refresh failed: {e!r}")
+            time.sleep(self.refresh_interval)
+
+    def reload(self):
+        """
+        Checkpoint, wait for the commit and re-read the summary tables, which
+        then include every worker's checkpointed counts.
+        """
+        with self._checkpoint_lock:
+            with self._lock:
+                # One swap for both, so a submission is either in this
+                # checkpoint and the read, or in the new _recent; never both
+                dirty, self._dirty = self._dirty, collections.defaultdict(_counts)
+                self._carry, self._recent = self._recent, collections.defaultdict(_counts)
+            self._write(dirty)
+            db.flush()
+            base = self._read()
+            with self._lock:
+                self._base = base
+                self._carry = {}
+                self._loaded_at = time.time()
+
+    def _read(self):
+        # Bounded reads: a range of the hourly table's primary key and one row
+        # per agent and check, however many sessions or hours there have been
+        since = hour_of(time.time()) - (self.retain_hours - 1) * 3600
+        with db.connection() as conn:
+            agents = conn.execute("SELECT agent_id, check_name, passed, failed FROM verification_totals").fetchall()
+            hours = conn.execute("SELECT hour, check_name, SUM(passed), SUM(failed) FROM verification_aggregates "
+                                 "WHERE hour >= ? GROUP BY hour, check_name", (since,)).fetchall()
+        base_totals, by_hour, by_agent = _counts(), {}, {}
+        for agent_id, check, passed, failed in agents:
+            if check in CHECKS:
+                _add(base_totals, {check: (passed, failed)})
+                _add(by_agent.setdefault(agent_id, _counts()), {check: (passed, failed)})
+        for hour, check, passed, failed in hours:
+            if check in CHECKS:
+                _add(by_hour.setdefault(hour, _counts()), {check: (passed, failed)})
+        return base_totals, by_hour, by_agent
+
+    def record(self, verification, agent_id=None, timestamp=None):
+        """
+        Count one submission. Returns the delta that was applied, in the
+        shape pushed to dashboards.
+        """
+        self._ensure_started()
+        hour = hour_of(time.time() if timestamp is None else timestamp)
+        agent_id = agent_id or ''
+        delta = {check: (1, 0) if verification.get(check) else (0, 1) for check in CHECKS}
+        with self._lock:
+            _add(self._recent[(hour, agent_id)], delta)
+            _add(self._dirty[(hour, agent_id)], delta)
+            _add(self._unsent['hours'].setdefault(hour, _counts()), delta)
+            _add(self._unsent['agents'].setdefault(agent_id, _counts()), delta)
+        return {'hour': hour, 'agent_id': agent_id, 'checks': _format(dict(delta))}
+
+    def checkpoint(self):
+        # Queue the accumulated deltas as additive upserts; does not wait for the commit
+        with self._checkpoint_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, collections.defaultdict(_counts)
+            self._write(dirty)
+
+    @staticmethod
+    def _write(dirty):
+        totals = collections.defaultdict(_counts)
+        for (hour, agent_id), counts in dirty.items():
+            _add(totals[agent_id], counts)
+            for check, (passed, failed) in counts.items():
+                if passed or failed:
+                    db.write(
+                        """
+                        INSERT INTO verification_aggregates (hour, agent_id, check_name, passed, failed)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT (hour, agent_id, check_name) DO UPDATE SET
+                            passed = passed + excluded.passed,
+                            failed = failed + excluded.failed
+                        """,
+                        (hour, agent_id, check, passed, failed),
+                    )
+        for agent_id, counts in totals.items():
+            for check, (passed, failed) in counts.items():
+                if passed or failed:
+                    db.write(
+                        """
+                        INSERT INTO verification_totals (agent_id, check_name, passed, failed)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT (agent_id, check_name) DO UPDATE SET
+                            passed = passed + excluded.passed,
+                            failed = failed + excluded.failed
+                        """,
+                        (agent_id, check, passed, failed),
+                    )
+
+    def drain_deltas(self):
+        # Merged changes since the last call, or None; dashboards add them to their copy
+        with self._lock:
+            unsent, self._unsent = self._unsent, {'hours': {}, 'agents': {}}
+        if not unsent['hours']:
+            return None
+        return {
+            'hours': {str(hour): _format(counts) for hour, counts in unsent['hours'].items()},
+            'agents': {agent: _format(counts) for agent, counts in unsent['agents'].items()},
+        }
+
+    def snapshot(self, agent_id=None):
+        # The tables' counts as of the last refresh plus this worker's newer
+        # submissions, from memory only; cost depends on the number of buckets
+        self._ensure_started()
+        oldest = hour_of(time.time()) - (self.retain_hours - 1) * 3600
+        with self._lock:
+            base_totals, base_hours, base_agents = self._base
+            totals = _copy(base_totals)
+            by_hour = {hour: _copy(counts) for hour, counts in base_hours.items() if hour >= oldest}
+            by_agent = {agent: _copy(counts) for agent, counts in base_agents.items()}
+            loaded_at = self._loaded_at
+            for recent in (self._carry, self._recent):
+                for (hour, agent), delta in recent.items():
+                    _add(totals, delta)
+                    _add(by_agent.setdefault(agent, _counts()), delta)
+                    if hour >= oldest:
+                        _add(by_hour.setdefault(hour, _counts()), delta)
+        result = {
+            'as_of': loaded_at,  # when other workers' counts were last read; None until the first refresh
+            'totals': _format(totals),
+            'by_hour': {str(hour): _format(counts) for hour, counts in sorted(by_hour.items())},
+        }
+        if agent_id is not None:
+            result['agent'] = {agent_id: _format(by_agent.get(agent_id, _counts()))}
+        else:
+            result['by_agent'] = {agent: _format(counts) for agent, counts in by_agent.items()}
+        return result
+
+
+aggregates = VerificationAggregates()
+
+
+def _checkpoint_at_exit():
+    # Registered after db's flush, so atexit runs it first and the flush commits it
+    aggregates.checkpoint()
+
+
+atexit.register(_checkpoint_at_exit)
@@ -1,44 +1,52 @@
 from flask import Flask, jsonify,request
 from flask_cors import CORS
-from flask_socketio import SocketIO
-import sqlite3
-from contextlib import closing
-from same_voice import same_voice
+from flask_socketio import SocketIO, emit
+import uuid
+from same_voice import same_voice, enroll_speaker, identify_speaker, embedding_scheduler
 import os
-from pydub import AudioSegment
-from werkzeug.utils import secure_filename
+import queue
+import threading
+import time
+from concurrent.futures import TimeoutError
+from voice_classification.audio_io import decode_audio, pcm16_to_float
+from streaming import DeepfakeStream, SpeakerStream
+import db
+import models
+from dashboard import DashboardHub
+from aggregates import aggregates
+from executor import executor, Overloaded
+from face_verify import verify_upload, enroll_face, MAX_FRAMES
+from face_verify import result_cache as face_result_cache
+from same_voice import result_cache as voice_result_cache
 
 app = Flask(__name__)
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
-UPLOAD_FOLDER = "uploads"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-DATABASE = 'users.db'
-
-
-# Initialize SpeechBrain (only once when server starts)
-try:
-    recognizer = SpeakerRecognition.from_hparams(
-        source="speechbrain/spkrec-ecapa-voxceleb",
-        savedir="pretrained_models/spkrec-ecapa-voxceleb"
-    )
-    print("SpeechBrain model loaded successfully")
-except Exception as e:
-    print(f"Error loading SpeechBrain: {str(e)}")
-    recognizer = None
+DEBUG = os.environ.get('FLASK_DEBUG', '0').lower() in ('1', 'true')
+# Model work runs in real OS threads (executor.py, batching.py), so the socket
+# layer uses threading mode rather than an unpatched eventlet loop that those
+# threads would block. SOCKETIO_MESSAGE_QUEUE (e.g. redis://) lets several
+# workers emit to each other's clients. Each client's events are handled in
+# order on its own connection thread (async_handlers=False), so live audio
+# chunks reach the streams in the order they were sent.
+socketio = SocketIO(app, cors_allowed_origins="*",
+                    async_mode=os.environ.get('SOCKETIO_ASYNC_MODE', 'threading'),
+                    message_queue=os.environ.get('SOCKETIO_MESSAGE_QUEUE'),
+                    async_handlers=False)
+dashboard = DashboardHub(socketio)
+dashboard.add_source('aggregates_delta', aggregates.drain_deltas)
+
+# Live deepfake scoring and speaker verification state, one per Socket.IO connection
+deepfake_streams = {}
+speaker_streams = {}
+stream_locks = {}
+
 
 def get_db():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # Pooled connection; use as `with get_db() as conn:`
+    return db.connection()
 
-def get_latest_verification():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users ORDER BY rowid DESC LIMIT 1")
-    record = cursor.fetchone()
-    conn.close()
-    return record
+def get_latest_verification(session_id=None, user_id=None):
+    return db.latest_verification(session_id=session_id, user_id=user_id)
 
 
 @app.route('/userform', methods=['POST'])
@@ -59,82 +67,287 @@ def handle_userform():
             'matching_face': data.get('matching_face', False)
         }
 
-        with closing(get_db()) as conn:
-            conn.execute('''
-                INSERT INTO users 
-                (first_name, middle_initial, last_name, last_four_digits, zip_code,
-                 human_voice, matching_voice, matching_face)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                int(verification_data['first_name']),
-                int(verification_data['middle_initial']),
-                int(verification_data['last_name']),
-                int(verification_data['last_four_digits']),
-                int(verification_data['zip_code']),
-                int(verification_data['human_voice']),  # Actual value
-                int(verification_data['matching_voice']),  # Actual value
-                int(verification_data['matching_face'])
-            ))
-            conn.commit()
+        # Queued for the background writer, so the request never waits on a commit
+        session_id = data.get('session_id') or uuid.uuid4().hex
+        db.save_verification(session_id, verification_data,
+                             user_id=data.get('user_id'), agent_id=data.get('agent_id'))
+        aggregates.record(verification_data, agent_id=data.get('agent_id'))
         
-        # Emit ACTUAL verification status
-        socketio.emit('verification_update', verification_data)
+        # Emit ACTUAL verification status, coalesced, to the session's, agent's and admins' rooms
+        dashboard.publish(dict(verification_data, session_id=session_id, user_id=data.get('user_id'),
+                               agent_id=data.get('agent_id'), updated_at=time.time()))
         
         return jsonify({
             'message': 'Data saved successfully',
+            'session_id': session_id,
             'verification_status': verification_data
         })
 
+    except queue.Full:
+        return jsonify({'error': 'Too many pending writes, retry shortly'}), 503, {'Retry-After': '1'}
     except Exception as e:
         print(f"Error saving user form: {str(e)}")  # Detailed error logging
         return jsonify({'error': str(e)}), 500
 
 @app.route('/admin/dashboard')
 def admin_dashboard():
-    record = get_latest_verification()
+    session_id = request.args.get('session_id')
+    user_id = request.args.get('user_id')
+    # Read from the database, so every worker returns the same state in the
+    # same shape as the live 'verification_update' events
+    record = dashboard.latest(session_id=session_id, user_id=user_id)
     if not record:
         return jsonify({"error": "No records found"}), 404
     
-    return jsonify(dict(record))
+    return jsonify(record)
+
+@app.route('/admin/aggregates')
+def admin_aggregates():
+    # Pass/fail counts per hour and per agent, from in-memory counters;
+    # live changes are pushed to the admins room as 'aggregates_delta'
+    return jsonify(aggregates.snapshot(agent_id=request.args.get('agent_id')))
 
 @socketio.on('connect')
 def handle_connect():
     print('Client connected')
-    # Send current state immediately on connection
-    record = get_latest_verification()
-    if record:
-        socketio.emit('verification_update', dict(record))
+
+@socketio.on('join_dashboard')
+def handle_join_dashboard(data=None):
+    # data: {"role": "admin"} and/or {"session_id": ..., "agent_id": ...};
+    # the cached current state of each joined room is sent back immediately
+    data = data or {}
+    rooms = dashboard.join(request.sid, session_id=data.get('session_id'), agent_id=data.get('agent_id'),
+                           admin=data.get('role') == 'admin')
+    emit('dashboard_joined', {'rooms': rooms})
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    deepfake_streams.pop(request.sid, None)
+    speaker_streams.pop(request.sid, None)
+    stream_locks.pop(request.sid, None)
+
+@socketio.on('deepfake_stream_start')
+def handle_deepfake_stream_start(data=None):
+    # data: {"sample_rate": 16000}; audio then arrives as binary int16 PCM chunks
+    sample_rate = int((data or {}).get('sample_rate', 16000))
+    deepfake_streams[request.sid] = DeepfakeStream(sample_rate)
+    emit('deepfake_stream_started', {'sample_rate': sample_rate})
+
+@socketio.on('voice_stream_start')
+def handle_voice_stream_start(data=None):
+    # data: {"user_id": ..., "sample_rate": 16000}; without user_id the reference sample is used
+    data = data or {}
+    sample_rate = int(data.get('sample_rate', 16000))
+    try:
+        speaker_streams[request.sid] = SpeakerStream(data.get('user_id'), sample_rate)
+    except KeyError as e:
+        emit('stream_error', {'error': str(e)})
+        return
+    emit('voice_stream_started', {'sample_rate': sample_rate})
+
+@socketio.on('audio_chunk')
+def handle_audio_chunk(chunk):
+    # The same call audio feeds every stream started on this connection
+    deepfake_stream = deepfake_streams.get(request.sid)
+    speaker_stream = speaker_streams.get(request.sid)
+    if deepfake_stream is None and speaker_stream is None:
+        emit('stream_error', {'error': 'Send deepfake_stream_start or voice_stream_start first'})
+        return
+    lock = stream_locks.setdefault(request.sid, threading.Lock())
+    state = {'started': False, 'dropped': False}
+    try:
+        samples = pcm16_to_float(chunk)
+        score, result = executor.run("audio-stream", push_chunk, lock, state, samples,
+                                     deepfake_stream, speaker_stream)
+    except BUSY_ERRORS as e:
+        if isinstance(e, TimeoutError):
+            # Drop the chunk unless it is already being applied (then wait for it,
+            # so no later chunk overtakes it)
+            with lock:
+                state['dropped'] = not state['started']
+            error = 'Timed out'
+        else:
+            error = 'Server is overloaded'
+        emit('stream_error', {'error': error, 'busy': True})
+        return
+    except Exception as e:
+        emit('stream_error', {'error': str(e)})
+        return
+    if score is not None:
+        emit('deepfake_score', score)
+    if result is not None:
+        emit('voice_score', result)
+        if result['decision'] is not None:
+            # Decided early; stop spending compute on this caller
+            speaker_streams.pop(request.sid, None)
+
+def push_chunk(lock, state, samples, deepfake_stream, speaker_stream):
+    # Runs in the executor, holding the connection's stream lock; skips a
+    # chunk whose handler timed out before it started
+    with lock:
+        if state['dropped']:
+            return None, None
+        state['started'] = True
+        score = deepfake_stream.push(samples) if deepfake_stream is not None else None
+        result = speaker_stream.push(samples) if speaker_stream is not None else None
+    return score, result
+
+def finish_stream(event, finish):
+    lock = stream_locks.setdefault(request.sid, threading.Lock())
+
+    def locked_finish():
+        with lock:
+            return finish()
+
+    try:
+        emit(event, executor.run("audio-stream", locked_finish))
+    except Exception as e:
+        emit('stream_error', {'error': str(e) or type(e).__name__})
+
+@socketio.on('deepfake_stream_stop')
+def handle_deepfake_stream_stop():
+    stream = deepfake_streams.pop(request.sid, None)
+    if stream is not None and stream.samples_seen:
+        finish_stream('deepfake_score', stream.score)
+
+@socketio.on('voice_stream_stop')
+def handle_voice_stream_stop():
+    stream = speaker_streams.pop(request.sid, None)
+    if stream is not None:
+        finish_stream('voice_score', stream.finish)
+
+def decode_upload(data):
+    # Decode uploaded bytes in memory into a 16 kHz mono float32 buffer
+    audio, _ = decode_audio(data)
+    return audio
+
+def busy_response(e):
+    # Shed load instead of queueing: per-route limit reached, model queue full, or too slow
+    if isinstance(e, TimeoutError):
+        return jsonify({"error": "Request timed out"}), 504
+    return jsonify({"error": "Server is overloaded, retry shortly"}), 503, {"Retry-After": "1"}
+
+BUSY_ERRORS = (Overloaded, queue.Full, TimeoutError)
 
 @app.route("/verify-voice", methods=["POST"])
 def verify_voice():
     if 'audio' not in request.files:
         return jsonify({"error": "No audio file received"}), 400
 
-    audio_file = request.files["audio"]
-    filename = secure_filename(audio_file.filename)
-    raw_path = os.path.join(UPLOAD_FOLDER, filename)
-    wav_path = os.path.join(UPLOAD_FOLDER, "converted.wav")
+    user_id = request.form.get("user_id")
+    try:
+        data = request.files["audio"].read()
+
+        # Decode and run voice verification against the claimed user (or the
+        # reference sample) in the worker pool; retried uploads hit the result cache
+        is_match = executor.run("verify-voice", lambda: same_voice(data, user_id=user_id))
+
+        return jsonify({"is_match": is_match})
+
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except BUSY_ERRORS as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/enroll-voice", methods=["POST"])
+def enroll_voice():
+    user_id = request.form.get("user_id")
+    files = request.files.getlist("audio")
+    if not user_id or not files:
+        return jsonify({"error": "user_id and at least one audio file are required"}), 400
+
+    try:
+        uploads = [audio_file.read() for audio_file in files]
+        replace = request.form.get("replace", "false").lower() == "true"
+        count = executor.run("enroll-voice", lambda: enroll_speaker(
+            user_id, [decode_upload(data) for data in uploads], replace=replace))
+        return jsonify({"user_id": user_id, "samples": count})
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except BUSY_ERRORS as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/identify-voice", methods=["POST"])
+def identify_voice():
+    if 'audio' not in request.files:
+        return jsonify({"error": "No audio file received"}), 400
+
+    k = request.form.get("k", 5, type=int)
+    try:
+        data = request.files["audio"].read()
+        matches = executor.run("identify-voice", lambda: identify_speaker(decode_upload(data), k=k))
+        return jsonify({"matches": [{"user_id": user_id, "score": score} for user_id, score in matches]})
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except BUSY_ERRORS as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/verify-face", methods=["POST"])
+def verify_face():
+    # Either a burst of JPEG frames ("frames") or a short clip ("video")
+    user_id = request.form.get("user_id")
+    frames = [f.read() for f in request.files.getlist("frames")[:MAX_FRAMES]]
+    video = request.files["video"].read() if not frames and 'video' in request.files else None
+    if not frames and not video:
+        return jsonify({"error": "No frames or video received"}), 400
 
     try:
-        # Save raw upload
-        audio_file.save(raw_path)
+        return jsonify(executor.run("verify-face", lambda: verify_upload(frames, video, user_id=user_id)))
 
-        # Convert to proper wav format (16-bit PCM, mono)
-        sound = AudioSegment.from_file(raw_path)
-        sound = sound.set_channels(1).set_frame_rate(16000)
-        sound.export(wav_path, format="wav")
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except BUSY_ERRORS as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        # Run voice verification
-        is_match = same_voice(wav_path)
+@app.route("/enroll-face", methods=["POST"])
+def enroll_face_route():
+    user_id = request.form.get("user_id")
+    if not user_id or 'image' not in request.files:
+        return jsonify({"error": "user_id and an image are required"}), 400
 
-        return jsonify({"is_match": is_match})
+    try:
+        data = request.files["image"].read()
+        count = executor.run("enroll-face", lambda: enroll_face(user_id, data))
+        return jsonify({"user_id": user_id, "enrolled_faces": count})
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except BUSY_ERRORS as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        # Clean up
-        if os.path.exists(raw_path): os.remove(raw_path)
-        if os.path.exists(wav_path): os.remove(wav_path)
+
+@app.route("/ready")
+def ready():
+    # Readiness probe: 200 once every required model is loaded (see models.warm_up)
+    is_ready = models.registry.ready()
+    return jsonify({"ready": is_ready, "models": models.registry.status()}), 200 if is_ready else 503
+
+@app.route("/metrics")
+def metrics():
+    return jsonify({"speaker_batching": embedding_scheduler.metrics(), "db_writer": db.writer.metrics(),
+                    "dashboard": dashboard.metrics(), "executor": executor.metrics(),
+                    "result_cache": {"same_voice": voice_result_cache.metrics(),
+                                     "face": face_result_cache.metrics()}})
 
 if __name__ == '__main__':
-    socketio.run(app, host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    # Models load lazily; warm them up in the background so /ready flips once they are in
+    if os.environ.get('WARM_UP', '1') == '1':
+        socketio.start_background_task(models.warm_up)
+    # Development server; see gunicorn.conf.py for the production launch
+    socketio.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5001)), debug=DEBUG,
+                 allow_unsafe_werkzeug=True)
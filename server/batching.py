@@ -0,0 +1,144 @@
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+import numpy as np
+
+
+class BatchScheduler:
+    """
+    Collects single-item requests into micro-batches for a batched function.
+
+    fn takes a list of items and returns a list of results in the same order.
+    A worker thread waits for the first item, then keeps collecting until
+    max_batch_size items are queued or max_wait seconds have passed, runs fn
+    once and resolves every caller's future. If a batch fails, its items are
+    retried one by one so each caller only gets its own error. submit()
+    raises queue.Full when max_queue requests are already waiting, so callers
+    can shed load instead of piling up behind a saturated model.
+    """
+
+    def __init__(self, fn, max_batch_size=16, max_wait=0.01, max_queue=256, name="batch"):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self._batches = 0
+        self._items = 0
+        self._rejected = 0
+        self._cancelled = 0
+        self._split = 0
+        self._batch_sizes = collections.Counter()
+        self._queue_waits = collections.deque(maxlen=1000)
+        self._run_times = collections.deque(maxlen=1000)
+
+    def _ensure_started(self):
+        # Started lazily so the thread is created in the process that serves
+        # requests, not in a parent that forks workers afterwards.
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def submit(self, item):
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            raise
+        return future
+
+    def __call__(self, item, timeout=None):
+        future = self.submit(item)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            # Still queued: the worker skips it instead of spending model time on it
+            future.cancel()
+            raise
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        started = time.monotonic()
+        # Drop requests whose caller already gave up
+        live = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+        if len(live) < len(batch):
+            with self._lock:
+                self._cancelled += len(batch) - len(live)
+        batch = live
+        if not batch:
+            return
+
+        try:
+            results = self.fn([item for item, _, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+            else:
+                # One bad item must not fail every caller that shared its batch
+                with self._lock:
+                    self._split += 1
+                for item, future, _ in batch:
+                    try:
+                        future.set_result(self.fn([item])[0])
+                    except Exception as item_error:
+                        future.set_exception(item_error)
+        else:
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+        with self._lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._batch_sizes[len(batch)] += 1
+            self._queue_waits.extend(started - enqueued for _, _, enqueued in batch)
+            self._run_times.append(time.monotonic() - started)
+
+    def metrics(self):
+        with self._lock:
+            waits = np.asarray(self._queue_waits) * 1000
+            runs = np.asarray(self._run_times) * 1000
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "rejected": self._rejected,
+                "cancelled": self._cancelled,
+                "split_batches": self._split,
+                "queue_depth": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+                "batch_size_histogram": {str(size): n for size, n in sorted(self._batch_sizes.items())},
+                "queue_wait_ms": {
+                    "mean": float(waits.mean()) if len(waits) else 0.0,
+                    "p95": float(np.percentile(waits, 95)) if len(waits) else 0.0,
+                    "max": float(waits.max()) if len(waits) else 0.0,
+                },
+                "batch_run_ms": {
+                    "mean": float(runs.mean()) if len(runs) else 0.0,
+                    "max": float(runs.max()) if len(runs) else 0.0,
+                },
+            }
@@ -0,0 +1,472 @@
+# End-to-end latency of the verification endpoints through the Flask test clients.
+# Run from server/:
+#   python -m benchmarks.bench_pipeline [--concurrency 1 8] [--requests 100] [--output bench.json]
+# By default the speaker, deepfake, sound and face models are replaced with
+# deterministic stubs (--real-models to use the real ones), so the numbers
+# cover decoding, features, batching, executor limits and the DB. Result
+# caches are cleared before every run; --no-result-cache bypasses them
+# entirely. Everything runs in a temporary working directory with a fresh
+# users.db. Keep the JSON of each run to compare commits.
+# When the repo-root app can't be imported, classify_voice and predict_sample
+# run the same stages directly through voice_classification (listed under
+# "direct" in the report) instead of over HTTP.
+import argparse
+import collections
+import glob
+import importlib.util
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(SERVER_DIR)
+SAMPLE_RATE = 16000
+SYNTHETIC_SECONDS = (1.0, 3.0, 6.0)
+ROUTES = ("verify-voice", "userform", "verify-face", "classify_voice", "predict_sample")
+BENCH_USER = "bench-user"
+
+
+class Stages:
+    """
+    Wall time per pipeline stage (decode, features, model, db), collected by
+    wrapping the functions that implement each stage.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._times = collections.defaultdict(list)
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._times[stage].append(time.perf_counter() - start)
+        return timed
+
+    def reset(self):
+        with self._lock:
+            self._times.clear()
+
+    def summary(self):
+        with self._lock:
+            return {stage: dict(percentiles(times), calls=len(times), total_ms=round(sum(times) * 1000, 3))
+                    for stage, times in sorted(self._times.items())}
+
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    if len(samples) == 0:
+        return {}
+    result = {f"p{p}_ms": round(float(np.percentile(samples, p)), 3) for p in (50, 95, 99)}
+    result["mean_ms"] = round(float(samples.mean()), 3)
+    result["max_ms"] = round(float(samples.max()), 3)
+    return result
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def wav_bytes(audio, sr=SAMPLE_RATE):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sr)
+        f.writeframes((np.clip(audio, -1, 1) * 32767).astype(np.int16).tobytes())
+    return buffer.getvalue()
+
+
+def synthetic_wavs(seed=0):
+    # Voiced-like harmonics with a slow pitch drift plus noise, deterministic per seed
+    rng = np.random.default_rng(seed)
+    clips = {}
+    for seconds in SYNTHETIC_SECONDS:
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        pitch = 120 + 30 * np.sin(2 * np.pi * 0.5 * t)
+        phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+        audio = sum(np.sin(k * phase) / k for k in range(1, 6)) * 0.3
+        audio += rng.normal(0, 0.02, len(t))
+        clips[f"synthetic_{seconds:g}s.wav"] = wav_bytes(audio)
+    return clips
+
+
+def bundled_wavs(limit):
+    paths = sorted(glob.glob(os.path.join(REPO_ROOT, "**", "*.wav"), recursive=True))
+    paths = [p for p in paths if "node_modules" not in p][:limit]
+    clips = {}
+    for path in paths:
+        with open(path, "rb") as f:
+            clips[os.path.relpath(path, REPO_ROOT)] = f.read()
+    return clips
+
+
+def jpeg_frames(seed=0):
+    import cv2
+    frames = {}
+    for path in sorted(glob.glob(os.path.join(SERVER_DIR, "*.jpg"))):
+        with open(path, "rb") as f:
+            frames[os.path.basename(path)] = f.read()
+    rng = np.random.default_rng(seed)
+    image = (rng.random((480, 640, 3)) * 255).astype(np.uint8)
+    frames["synthetic.jpg"] = cv2.imencode(".jpg", image)[1].tobytes()
+    return frames
+
+
+# --- deterministic stand-ins for the heavy models -------------------------
+
+def stub_embed_signals(signals, delay=0.0):
+    # Log spectrum folded to 192 bins instead of an ECAPA forward pass
+    embeddings = []
+    for signal in signals:
+        spectrum = np.log1p(np.abs(np.fft.rfft(signal[:SAMPLE_RATE * 2], n=4096)))
+        embedding = np.add.reduceat(spectrum, np.linspace(0, len(spectrum), 193, dtype=int)[:-1])
+        embeddings.append((embedding / np.linalg.norm(embedding)).astype(np.float32))
+    time.sleep(delay)
+    return embeddings
+
+
+class StubVoiceClassifier:
+    version = "stub"
+
+    def __init__(self, threshold, delay=0.0):
+        self.threshold = threshold
+        self.delay = delay
+
+    def predict_proba(self, features):
+        time.sleep(self.delay)
+        rows = np.asarray(features, dtype=np.float64).reshape(len(features), -1)
+        return 1 / (1 + np.exp(-rows.mean(axis=1) / 10))
+
+
+class StubSoundClassifier:
+    labels = np.array(["quiet", "office", "street", "music"])
+
+    def predict(self, features):
+        features = np.asarray(features).reshape(len(features), -1)
+        return self.labels[(np.abs(features).sum(axis=1) * 100).astype(int) % len(self.labels)]
+
+
+class StubFace:
+    # Same interface as the face_recognition module for what the server uses
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def face_locations(self, rgb):
+        h, w = rgb.shape[:2]
+        return [(h // 4, 3 * w // 4, 3 * h // 4, w // 4)]
+
+    def face_encodings(self, rgb, locations):
+        import cv2
+        time.sleep(self.delay)
+        encodings = []
+        for top, right, bottom, left in locations:
+            crop = cv2.cvtColor(rgb[top:bottom, left:right], cv2.COLOR_RGB2GRAY)
+            encoding = cv2.resize(crop, (16, 8)).astype(np.float64).ravel()
+            encodings.append(encoding / (np.linalg.norm(encoding) or 1) * 0.3)
+        return encodings
+
+
+# --- app setup --------------------------------------------------------------
+
+def load_server_app(stages, stub, delay):
+    import app as server_app
+    import db
+    import face_utils
+    import face_verify
+    import models
+    import same_voice
+    from face_gallery import FaceGallery
+    from voice_classification import features
+
+    if stub:
+        same_voice.embedding_scheduler.fn = stages.wrap(
+            "model", lambda signals: stub_embed_signals(signals, delay))
+    else:
+        same_voice.embedding_scheduler.fn = stages.wrap("model", same_voice.embedding_scheduler.fn)
+
+    def load_face():
+        face = StubFace(delay) if stub else models._load_face()
+        return SimpleNamespace(face_locations=stages.wrap("model", face.face_locations),
+                               face_encodings=stages.wrap("model", face.face_encodings))
+    models.registry.register("face", load_face)
+
+    for module in (same_voice, features, server_app):
+        if hasattr(module, "decode_audio"):
+            module.decode_audio = stages.wrap("decode", module.decode_audio)
+    face_verify.decode_jpeg = stages.wrap("decode", face_verify.decode_jpeg)
+    same_voice.trim_silence = stages.wrap("features", same_voice.trim_silence)
+    features.AudioFeatures.mfcc_fixed = stages.wrap("features", features.AudioFeatures.mfcc_fixed)
+    db.save_verification = stages.wrap("db", db.save_verification)
+    db.writer.fn = stages.wrap("db_commit", db.writer.fn)
+
+    face_utils._gallery = FaceGallery()
+    return server_app
+
+
+def load_root_app(stages, stub, delay, samples_dir):
+    # The repo-root app (deepfake + sound classifier demo) is a separate module
+    # also named app; load it from its path under another name.
+    spec = importlib.util.spec_from_file_location("root_app", os.path.join(REPO_ROOT, "app.py"))
+    root_app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(root_app)
+
+    classify_globals = root_app.classify.__globals__
+    if stub:
+        classify_globals["classifier"] = StubVoiceClassifier(classify_globals["CUSTOM_THRESHOLD"], delay)
+        root_app._clf = StubSoundClassifier()
+    classifier = classify_globals["classifier"]
+    classifier.predict_proba = stages.wrap("model", classifier.predict_proba)
+    sample_index = type(root_app.sample_index)(samples_dir, index_path=None)
+    sample_index.refresh()
+    root_app.sample_index = sample_index
+    return root_app
+
+
+def load_direct_stages(stages, stub, delay, samples_dir):
+    # What the root app's /classify_voice and /predict_sample do, without Flask
+    import joblib
+    from voice_classification import voice_classifier
+    from voice_classification.result_cache import ResultCache
+    from voice_classification.sample_index import SampleIndex
+
+    if stub:
+        voice_classifier.classifier = StubVoiceClassifier(voice_classifier.CUSTOM_THRESHOLD, delay)
+    classifier = voice_classifier.classifier
+    classifier.predict_proba = stages.wrap("model", classifier.predict_proba)
+    sound_path = os.path.join(REPO_ROOT, "sound_classifier", "sound_classifier.pkl")
+    sound_classifier = StubSoundClassifier() if stub else joblib.load(sound_path)
+    sound_classifier.predict = stages.wrap("model", sound_classifier.predict)
+    sample_index = SampleIndex(samples_dir, index_path=None)
+    sample_index.refresh()
+    return SimpleNamespace(classify=voice_classifier.classify, voice_result_cache=voice_classifier.result_cache,
+                           sound_classifier=sound_classifier, sound_result_cache=ResultCache("sound_classifier"),
+                           sample_index=sample_index)
+
+
+def result_caches(root):
+    import face_verify
+    import same_voice
+    caches = {"same_voice": same_voice.result_cache, "face": face_verify.result_cache}
+    if root is not None:
+        caches["voice_classifier"] = root.voice_result_cache
+        caches["sound_classifier"] = root.sound_result_cache
+    return caches
+
+
+def bypass(cache):
+    cache.get = lambda key: (False, None)
+    cache.put = lambda key, value: None
+
+
+def enroll_bench_identities(clips, frames):
+    import face_verify
+    import same_voice
+    first_clip = next(iter(clips.values()))
+    same_voice.enroll_speaker(BENCH_USER, [first_clip], replace=True)
+    first_frame = next(iter(frames.values()))
+    face_verify.enroll_face(BENCH_USER, first_frame)
+
+
+class DirectResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def request_builders(clips, frames, sample_names, direct=None):
+    clip_items = list(clips.items())
+    frame_items = list(frames.values())
+
+    def verify_voice(client, i):
+        name, data = clip_items[i % len(clip_items)]
+        return client.post("/verify-voice", data={"user_id": BENCH_USER, "audio": (io.BytesIO(data), name)})
+
+    def userform(client, i):
+        return client.post("/userform", json={
+            "first_name": "John", "middle_initial": "D", "last_name": "Doe", "last_four_digits": "1234",
+            "zip_code": "12345", "human_voice": i % 2 == 0, "matching_voice": i % 3 == 0,
+            "matching_face": i % 5 == 0, "session_id": f"bench-{i}", "agent_id": f"agent-{i % 4}",
+        })
+
+    def verify_face(client, i):
+        burst = [frame_items[(i + k) % len(frame_items)] for k in range(3)]
+        return client.post("/verify-face", data={
+            "user_id": BENCH_USER, "frames": [(io.BytesIO(data), f"{k}.jpg") for k, data in enumerate(burst)]})
+
+    def classify_voice(client, i):
+        name, data = clip_items[i % len(clip_items)]
+        return client.post("/classify_voice", data={"audio": (io.BytesIO(data), name)})
+
+    def predict_sample(client, i):
+        return client.post("/predict_sample", json={"sample": sample_names[i % len(sample_names)]})
+
+    def classify_voice_direct(_, i):
+        direct.classify(clip_items[i % len(clip_items)][1])
+        return DirectResponse(200)
+
+    def predict_sample_direct(_, i):
+        entry = direct.sample_index.get(sample_names[i % len(sample_names)])
+        if entry is None:
+            return DirectResponse(404)
+        cache = direct.sound_result_cache
+        cache.get_or_compute(cache.key(entry["hash"]),
+                             lambda: str(direct.sound_classifier.predict(entry["mel"].reshape(1, -1))[0]))
+        return DirectResponse(200)
+
+    return {
+        "verify-voice": ("server", verify_voice),
+        "userform": ("server", userform),
+        "verify-face": ("server", verify_face),
+        "classify_voice": ("root", classify_voice) if direct is None else ("direct", classify_voice_direct),
+        "predict_sample": ("root", predict_sample) if direct is None else ("direct", predict_sample_direct),
+    }
+
+
+def run_route(flask_app, build, requests, concurrency, stages, caches):
+    # flask_app is None for stages called directly rather than over HTTP
+    import db
+    local = threading.local()
+
+    def one(i):
+        if not hasattr(local, "client"):
+            local.client = flask_app.test_client() if flask_app is not None else None
+        start = time.perf_counter()
+        try:
+            status = build(local.client, i).status_code
+        except Exception as e:
+            if flask_app is not None:
+                raise
+            print(f"Direct call failed: {e}")
+            status = 500
+        return time.perf_counter() - start, status
+
+    stages.reset()
+    for cache in caches.values():
+        cache.clear()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+    # Commit this route's queued writes now, so their time shows up here as
+    # db_commit instead of in the next route's numbers
+    db.flush()
+
+    latencies = [latency for latency, _ in results]
+    statuses = collections.Counter(str(status) for _, status in results)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "status_codes": dict(statuses),
+        "errors": sum(n for status, n in statuses.items() if not status.startswith("2")),
+        "latency": percentiles(latencies),
+        "throughput_rps": round(requests / wall, 2) if wall else 0.0,
+        "wall_s": round(wall, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stages.summary(),
+        "result_cache": {name: cache.metrics()["hit_rate"] for name, cache in caches.items()},
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end verification pipeline benchmark")
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=list(ROUTES))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--requests", type=int, default=100, help="requests per route and concurrency level")
+    parser.add_argument("--bundled", type=int, default=8, help="max bundled WAVs to include")
+    parser.add_argument("--real-models", action="store_true", help="use the real models instead of stubs")
+    parser.add_argument("--model-delay-ms", type=float, default=0.0, help="simulated inference time for stubs")
+    parser.add_argument("--no-result-cache", action="store_true", help="never answer from the result caches")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args(argv)
+
+    stub, delay = not args.real_models, args.model_delay_ms / 1000
+    clips = dict(synthetic_wavs(), **bundled_wavs(args.bundled))
+    frames = jpeg_frames()
+    output_path = os.path.abspath(args.output) if args.output else None
+
+    sys.path.insert(0, SERVER_DIR)
+    sys.path.append(REPO_ROOT)
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.chdir(workdir)  # users.db, speaker store, gallery and caches all go here
+    samples_dir = os.path.join(workdir, "samples")
+    os.makedirs(samples_dir)
+    for name, data in clips.items():
+        with open(os.path.join(samples_dir, os.path.basename(name)), "wb") as f:
+            f.write(data)
+
+    stages = Stages()
+    report = {
+        "revision": git_revision(),
+        "stub_models": stub,
+        "model_delay_ms": args.model_delay_ms,
+        "inputs": {"wav": sorted(clips), "jpeg": sorted(frames)},
+        "routes": {},
+        "direct": {},
+    }
+
+    apps = {"server": load_server_app(stages, stub, delay).app, "root": None, "direct": None}
+    enroll_bench_identities(clips, frames)
+    root, direct = None, None
+    try:
+        root = load_root_app(stages, stub, delay, samples_dir)
+        apps["root"] = root.app
+    except ImportError as e:
+        root_error = f"root app.py could not be imported ({e}); stages called directly"
+        root = direct = load_direct_stages(stages, stub, delay, samples_dir)
+    caches = result_caches(root)
+    if args.no_result_cache:
+        for cache in caches.values():
+            bypass(cache)
+
+    builders = request_builders(clips, frames, sorted(os.listdir(samples_dir)), direct)
+    for route in args.routes:
+        app_name, build = builders[route]
+        if app_name == "direct":
+            report["direct"][route] = root_error
+        report["routes"][route] = [
+            run_route(apps[app_name], build, args.requests, concurrency, stages, caches)
+            for concurrency in args.concurrency
+        ]
+
+    import db
+    import same_voice
+    from executor import executor
+    db.flush()
+    report["speaker_batching"] = same_voice.embedding_scheduler.metrics()
+    report["db_writer"] = db.writer.metrics()
+    report["executor"] = executor.metrics()
+    report["peak_rss_mb"] = peak_rss_mb()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if output_path:
+        with open(output_path, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Enrollment and lookup latency of the speaker store at bank scale.
+# Run from server/: python -m benchmarks.bench_speaker_store [--sizes 10000 100000]
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from speaker_store import EMBEDDING_DIM, SpeakerStore
+
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(samples, p)), 4) for p in (50, 95, 99)}
+
+
+def bench(size, queries=200, seed=0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((size, EMBEDDING_DIM)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as root:
+        store = SpeakerStore(root)
+
+        start = time.perf_counter()
+        batch = 10000
+        for offset in range(0, size, batch):
+            store.enroll_many(
+                (f"user{i}", embeddings[i]) for i in range(offset, min(offset + batch, size))
+            )
+        bulk_s = time.perf_counter() - start
+
+        enroll_times = []
+        for i in range(queries):
+            start = time.perf_counter()
+            store.enroll(f"new{i}", rng.standard_normal(EMBEDDING_DIM))
+            enroll_times.append(time.perf_counter() - start)
+
+        probes = embeddings[rng.integers(0, size, queries)] + 0.1 * rng.standard_normal(
+            (queries, EMBEDDING_DIM)
+        ).astype(np.float32)
+        claimed = rng.integers(0, size, queries)
+
+        verify_times, search_times = [], []
+        for probe, row in zip(probes, claimed):
+            start = time.perf_counter()
+            store.verify(f"user{row}", probe)
+            verify_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            store.search(probe, k=5)
+            search_times.append(time.perf_counter() - start)
+
+        reload_start = time.perf_counter()
+        SpeakerStore(root)
+        reload_s = time.perf_counter() - reload_start
+
+    return {
+        "speakers": size,
+        "bulk_enroll_s": round(bulk_s, 3),
+        "enroll": percentiles(enroll_times),
+        "verify": percentiles(verify_times),
+        "search_top5": percentiles(search_times),
+        "open_store_s": round(reload_s, 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Speaker store latency benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        print(json.dumps(bench(size, args.queries)))
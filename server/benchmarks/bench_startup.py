@@ -0,0 +1,85 @@
+# Cold-start cost of the server: import time and time to first request.
+# Each measurement runs in a fresh interpreter so nothing is already imported.
+# Run from server/: python -m benchmarks.bench_startup [--repeat 3] [--sample Tarun.wav]
+# Run it on two checkouts to compare before/after a change.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Prints one JSON line: seconds to import app, then to serve /verify-voice
+# three times. The first request pays for any model loading left to it. The
+# second sends different bytes (one sample changed), so it is a real warm
+# request rather than a result-cache hit; the third repeats the first and is.
+CHILD = """
+import io, json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+with open(sys.argv[1], "rb") as f:
+    data = f.read()
+other = data[:-1] + bytes([data[-1] ^ 1])
+def request(body):
+    t = time.perf_counter()
+    response = client.post("/verify-voice", data={"audio": (io.BytesIO(body), "sample.wav")})
+    return time.perf_counter() - t, response.status_code
+first, status = request(data)
+second, _ = request(other)
+cached, _ = request(data)
+heavy = [m for m in ("torch", "speechbrain", "librosa", "face_recognition") if m in sys.modules]
+print(json.dumps({
+    "import_s": imported - start,
+    "first_request_s": first,
+    "second_request_s": second,
+    "cached_request_s": cached,
+    "time_to_first_response_s": imported - start + first,
+    "status": status,
+    "heavy_modules_after_first_request": heavy,
+}))
+"""
+
+# Heavy modules pulled in by the import alone
+IMPORT_ONLY = """
+import json, sys, time
+start = time.perf_counter()
+import app
+print(json.dumps({"import_s": time.perf_counter() - start,
+                  "heavy_modules": [m for m in ("torch", "speechbrain", "librosa", "face_recognition")
+                                    if m in sys.modules]}))
+"""
+
+
+def run(code, *args):
+    env = dict(os.environ, WARM_UP="0")
+    output = subprocess.run([sys.executable, "-c", code, *args], cwd=SERVER_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def median(runs, key):
+    return round(statistics.median(run[key] for run in runs), 3)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Startup benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sample", default=os.path.join(SERVER_DIR, "Tarun.wav"))
+    args = parser.parse_args()
+
+    imports = [run(IMPORT_ONLY) for _ in range(args.repeat)]
+    requests = [run(CHILD, os.path.abspath(args.sample)) for _ in range(args.repeat)]
+    print(json.dumps({
+        "import_s": median(imports, "import_s"),
+        "heavy_modules_at_import": imports[-1]["heavy_modules"],
+        "first_request_s": median(requests, "first_request_s"),
+        "second_request_s": median(requests, "second_request_s"),
+        "cached_request_s": median(requests, "cached_request_s"),
+        "time_to_first_response_s": median(requests, "time_to_first_response_s"),
+        "status": requests[-1]["status"],
+        "heavy_modules_after_first_request": requests[-1]["heavy_modules_after_first_request"],
+    }, indent=2))
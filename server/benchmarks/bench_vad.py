@@ -0,0 +1,75 @@
+# Latency with and without VAD trimming on the sample WAVs in the repo.
+# Run from server/: python -m benchmarks.bench_vad [--speaker] [--repeat 5]
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+from voice_classification.audio_io import TARGET_SR, load_audio
+from voice_classification.vad import trim_silence
+from voice_classification.voice_classifier import mfcc_features
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def sample_wavs():
+    return sorted(glob.glob(os.path.join(REPO_ROOT, "**", "*.wav"), recursive=True))
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000, result
+
+
+def bench_file(path, repeat, embed=None):
+    audio, sr = load_audio(path, sr=None)
+    vad_ms, (speech, segments) = best_of(lambda: trim_silence(audio, sr), repeat)
+    full_mfcc_ms, _ = best_of(lambda: mfcc_features(audio, sr), repeat)
+    trimmed_mfcc_ms, _ = best_of(lambda: mfcc_features(speech, sr), repeat)
+    # The speaker path runs the VAD on 16 kHz audio, the classifier at the native rate
+    audio16, _ = load_audio(path, sr=TARGET_SR)
+    vad16_ms, (speech16, _) = best_of(lambda: trim_silence(audio16, TARGET_SR), repeat)
+    result = {
+        "file": os.path.relpath(path, REPO_ROOT),
+        "sample_rate": sr,
+        "seconds": round(len(audio) / sr, 3),
+        "speech_seconds": round(len(speech) / sr, 3),
+        "segments": len(segments),
+        "vad_ms": round(vad_ms, 3),
+        "vad_16k_ms": round(vad16_ms, 3),
+        "mfcc_ms": {"full": round(full_mfcc_ms, 3), "trimmed": round(trimmed_mfcc_ms, 3)},
+    }
+
+    if embed is not None:
+        full_ms, _ = best_of(lambda: embed([audio16]), repeat)
+        trimmed_ms, _ = best_of(lambda: embed([speech16]), repeat)
+        result["embedding_ms"] = {
+            "full": round(full_ms, 3),
+            "trimmed_including_vad": round(trimmed_ms + vad16_ms, 3),
+        }
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VAD latency benchmark")
+    parser.add_argument("files", nargs="*", help="WAV files (default: every .wav in the repo)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--speaker", action="store_true", help="also time ECAPA embeddings (loads SpeechBrain)")
+    args = parser.parse_args()
+
+    embed = None
+    if args.speaker:
+        from same_voice import embed_signals as embed
+
+    results = [bench_file(path, args.repeat, embed) for path in args.files or sample_wavs()]
+    for result in results:
+        print(json.dumps(result))
+    speech_ratio = np.mean([r["speech_seconds"] / r["seconds"] for r in results])
+    print(json.dumps({"mean_speech_ratio": round(float(speech_ratio), 3)}))
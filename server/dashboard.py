@@ -0,0 +1,223 @@
+import collections
+import threading
+
+from flask_socketio import join_room
+
+import db
+
+ADMIN_ROOM = 'admins'
+COALESCE_INTERVAL = 0.25  # at most one update per room per interval
+PAYLOAD_FIELDS = ('session_id', 'user_id', 'agent_id', 'updated_at')
+MAX_CACHED_ROOMS = 10000  # latest state per room; least recently used rooms are read from the DB again
+
+
+def session_room(session_id):
+    return f"session:{session_id}"
+
+
+def agent_room(agent_id):
+    return f"agent:{agent_id}"
+
+
+def is_dashboard_room(room):
+    return isinstance(room, str) and (room == ADMIN_ROOM or room.startswith(('session:', 'agent:')))
+
+
+def payload(record):
+    """
+    The one shape dashboard clients get, whether the state comes from a form
+    submission or from a verification_sessions row: the eight checks as
+    booleans plus the session, user and agent ids and updated_at.
+    """
+    state = {field: bool(record.get(field)) for field in db.VERIFICATION_FIELDS}
+    state.update({field: record.get(field) for field in PAYLOAD_FIELDS})
+    return state
+
+
+class DashboardHub:
+    """
+    Routes verification updates to the rooms that care about them: the
+    session's own room, its agent's room and the admins room.
+
+    Updates are coalesced: publish() only records the newest state per room,
+    and a background task emits whatever is pending at most once per
+    `interval`, so a burst of form submissions costs each room one message.
+
+    Clients joining a room get its latest state from an in-memory cache, so
+    a new connection costs no query. publish() fills the cache, and with a
+    message queue every worker also caches the updates the others emit
+    (they all pass through the client manager), so workers agree. A room
+    that isn't cached (e.g. after a restart) is read from the database once.
+    """
+
+    def __init__(self, socketio, interval=COALESCE_INTERVAL, event='verification_update'):
+        self.socketio = socketio
+        self.interval = interval
+        self.event = event
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._latest = collections.OrderedDict()  # room -> payload, least recently used first
+        self._task = None
+        self._sources = []
+        self.emitted = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._follow_queue()
+
+    def _follow_queue(self):
+        # With a message queue, emits from every worker (this one included)
+        # are delivered through the client manager's _handle_emit; cache the
+        # room states they carry. Without one, publish() is the only source.
+        manager = getattr(getattr(self.socketio, 'server', None), 'manager', None)
+        handle_emit = getattr(manager, '_handle_emit', None)
+        if handle_emit is None:
+            return
+
+        def observe(message):
+            room, data = message.get('room'), message.get('data')
+            if message.get('event') == self.event and is_dashboard_room(room):
+                if isinstance(data, list) and len(data) == 1:
+                    data = data[0]
+                if isinstance(data, dict):
+                    self._remember(room, data)
+            return handle_emit(message)
+
+        manager._handle_emit = observe
+
+    def _remember(self, room, state):
+        with self._lock:
+            cached = self._latest.get(room)
+            # Queue messages may arrive late; never replace a newer state
+            if cached is not None and (cached.get('updated_at') or 0) > (state.get('updated_at') or 0):
+                return
+            self._latest[room] = state
+            self._latest.move_to_end(room)
+            while len(self._latest) > MAX_CACHED_ROOMS:
+                self._latest.popitem(last=False)
+
+    def _ensure_started(self):
+        # Started on first use so it runs in the serving process, not a pre-fork parent
+        if self._task is None:
+            with self._lock:
+                if self._task is None:
+                    self._task = self.socketio.start_background_task(self._run)
+
+    def rooms_for(self, state):
+        rooms = [ADMIN_ROOM]
+        if state.get('session_id'):
+            rooms.append(session_room(state['session_id']))
+        if state.get('agent_id'):
+            rooms.append(agent_room(state['agent_id']))
+        return rooms
+
+    def add_source(self, event, drain, room=ADMIN_ROOM):
+        """
+        Also emit `event` to room each interval with whatever drain() returns,
+        for updates that must be merged rather than replaced (e.g. deltas).
+        drain() returns None when there is nothing to send.
+        """
+        self._sources.append((event, drain, room))
+
+    def publish(self, state):
+        self._ensure_started()
+        state = payload(state)
+        rooms = self.rooms_for(state)
+        for room in rooms:
+            self._remember(room, state)
+        with self._lock:
+            for room in rooms:
+                if room in self._pending:
+                    self.coalesced += 1
+                self._pending[room] = state
+
+    def join(self, sid, session_id=None, agent_id=None, admin=False):
+        """
+        Add a client to its rooms and send it the current state of each.
+        Must be called from inside a Socket.IO event handler.
+        """
+        lookups = []
+        if admin:
+            lookups.append((ADMIN_ROOM, {}))
+        if session_id:
+            lookups.append((session_room(session_id), {'session_id': session_id}))
+        if agent_id:
+            lookups.append((agent_room(agent_id), {'agent_id': agent_id}))
+        sent = set()
+        for room, query in lookups:
+            join_room(room)
+            state = self._cached_or_query(room, query)
+            # A session's state is usually also its agent's latest; send it once
+            if state is not None and state['session_id'] not in sent:
+                self.socketio.emit(self.event, state, to=sid)
+                sent.add(state['session_id'])
+        return [room for room, _ in lookups]
+
+    def latest(self, session_id=None, user_id=None, agent_id=None):
+        # Newest state overall, or for one session, user or agent, as a payload()
+        query = {'session_id': session_id, 'user_id': user_id, 'agent_id': agent_id}
+        if user_id is not None:
+            return self._query(query)  # users have no room, so nothing is cached for them
+        if session_id is not None:
+            return self._cached_or_query(session_room(session_id), query)
+        if agent_id is not None:
+            return self._cached_or_query(agent_room(agent_id), query)
+        return self._cached_or_query(ADMIN_ROOM, query)
+
+    def _cached_or_query(self, room, query):
+        with self._lock:
+            state = self._latest.get(room)
+            if state is not None:
+                self._latest.move_to_end(room)
+                self.cache_hits += 1
+                return state
+            self.cache_misses += 1
+        state = self._query(query)
+        if state is not None:
+            self._remember(room, state)
+        return state
+
+    @staticmethod
+    def _query(query):
+        record = db.latest_verification(**query)
+        return payload(record) if record else None
+
+    def _run(self):
+        # socketio.sleep rather than a threading primitive, so this works
+        # under eventlet as well as the threading async mode
+        while True:
+            self.socketio.sleep(self.interval)
+            try:
+                self._emit_pending()
+            except Exception as e:
+                # Keep the loop alive; one bad update must not stop all later ones
+                with self._lock:
+                    self.errors += 1
+                print(f"Dashboard update failed: {e!r}")
+
+    def _emit_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for room, state in pending.items():
+            self.socketio.emit(self.event, state, to=room)
+        sent = len(pending)
+        for event, drain, room in self._sources:
+            update = drain()
+            if update is not None:
+                self.socketio.emit(event, update, to=room)
+                sent += 1
+        with self._lock:
+            self.emitted += sent
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "rooms_cached": len(self._latest),
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "pending": len(self._pending),
+                "emitted": self.emitted,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+            }
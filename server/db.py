@@ -0,0 +1,320 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+
+from batching import BatchScheduler
+
+DATABASE = 'users.db'
+POOL_SIZE = 8
+WRITE_BATCH_SIZE = 256
+WRITE_MAX_WAIT = 0.05  # seconds a write may wait for others to share its commit
+WRITE_MAX_QUEUE = 10000
+
+PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",  # with WAL: durable at checkpoints, no fsync per commit
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",  # 16 MB
+    "PRAGMA mmap_size = 268435456",
+]
+
+VERIFICATION_FIELDS = [
+    'first_name', 'middle_initial', 'last_name', 'last_four_digits', 'zip_code',
+    'human_voice', 'matching_voice', 'matching_face',
+]
+
+# Applied in order; PRAGMA user_version records how many have run.
+# Never edit a released migration, append a new one instead.
+MIGRATIONS = [
+    # 1: the original schema.sql table
+    [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            first_name BOOLEAN DEFAULT 0,
+            middle_initial BOOLEAN DEFAULT 0,
+            last_name BOOLEAN DEFAULT 0,
+            last_four_digits BOOLEAN DEFAULT 0,
+            zip_code BOOLEAN DEFAULT 0,
+            human_voice BOOLEAN DEFAULT 0,
+            matching_voice BOOLEAN DEFAULT 0,
+            matching_face BOOLEAN DEFAULT 0
+        )
+        """,
+    ],
+    # 2: one row per verification session, keyed by session and user
+    [
+        """
+        CREATE TABLE verification_sessions (
+            id INTEGER PRIMARY KEY,
+            session_id TEXT NOT NULL UNIQUE,
+            user_id TEXT,
+            agent_id TEXT,
+            first_name INTEGER NOT NULL DEFAULT 0,
+            middle_initial INTEGER NOT NULL DEFAULT 0,
+            last_name INTEGER NOT NULL DEFAULT 0,
+            last_four_digits INTEGER NOT NULL DEFAULT 0,
+            zip_code INTEGER NOT NULL DEFAULT 0,
+            human_voice INTEGER NOT NULL DEFAULT 0,
+            matching_voice INTEGER NOT NULL DEFAULT 0,
+            matching_face INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX idx_sessions_user ON verification_sessions (user_id, updated_at)",
+        "CREATE INDEX idx_sessions_agent ON verification_sessions (agent_id, updated_at)",
+        "CREATE INDEX idx_sessions_updated ON verification_sessions (updated_at)",
+        # Keep the history recorded before sessions existed
+        """
+        INSERT INTO verification_sessions
+            (session_id, first_name, middle_initial, last_name, last_four_digits, zip_code,
+             human_voice, matching_voice, matching_face, created_at, updated_at)
+        SELECT 'legacy-' || rowid, first_name, middle_initial, last_name, last_four_digits, zip_code,
+               human_voice, matching_voice, matching_face, 0, 0
+        FROM users ORDER BY rowid
+        """,
+    ],
+    # 3: hourly pass/fail counters per agent, checkpointed by aggregates.py
+    [
+        """
+        CREATE TABLE verification_aggregates (
+            hour INTEGER NOT NULL,
+            agent_id TEXT NOT NULL DEFAULT '',
+            check_name TEXT NOT NULL,
+            passed INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (hour, agent_id, check_name)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX idx_aggregates_agent ON verification_aggregates (agent_id, hour)",
+        # Backfill from the sessions recorded so far (one-off full scan)
+    ] + [
+        f"""
+        INSERT INTO verification_aggregates (hour, agent_id, check_name, passed, failed)
+        SELECT CAST(created_at / 3600 AS INTEGER) * 3600, COALESCE(agent_id, ''), '{check}',
+               SUM({check} != 0), SUM({check} = 0)
+        FROM verification_sessions GROUP BY 1, 2
+        """
+        for check in ('human_voice', 'matching_voice', 'matching_face')
+    ],
+    # 4: all-time pass/fail totals per agent, so they are read without scanning every hour
+    [
+        """
+        CREATE TABLE verification_totals (
+            agent_id TEXT NOT NULL DEFAULT '',
+            check_name TEXT NOT NULL,
+            passed INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (agent_id, check_name)
+        ) WITHOUT ROWID
+        """,
+        """
+        INSERT INTO verification_totals (agent_id, check_name, passed, failed)
+        SELECT agent_id, check_name, SUM(passed), SUM(failed)
+        FROM verification_aggregates GROUP BY agent_id, check_name
+        """,
+    ],
+]
+
+
+def connect(path=None):
+    # Autocommit mode: transactions are opened explicitly with transaction()
+    conn = sqlite3.connect(path or DATABASE, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+@contextmanager
+def transaction(conn):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def migrate(conn):
+    """
+    Bring the database up to len(MIGRATIONS). Each migration runs in its own
+    write transaction, so concurrent workers starting at once apply it once.
+    """
+    for version, statements in enumerate(MIGRATIONS, start=1):
+        with transaction(conn):
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+            print(f"Migrated database to schema version {version}")
+
+
+class ConnectionPool:
+    """
+    A fixed number of shared connections handed out one thread at a time.
+    Connections are opened on demand, and reopened in a forked child rather
+    than sharing the parent's file descriptors.
+    """
+
+    def __init__(self, path=None, size=POOL_SIZE):
+        self.path = path or DATABASE
+        self.size = size
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        with closing(connect(self.path)) as conn:
+            migrate(conn)
+
+    @contextmanager
+    def connection(self, timeout=10):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+        conn = self._acquire(timeout)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self._idle.put(conn)
+
+    def _acquire(self, timeout):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return connect(self.path)
+        return self._idle.get(timeout=timeout)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+@contextmanager
+def connection():
+    with get_pool().connection() as conn:
+        yield conn
+
+
+def _write_batch(writes):
+    """
+    Run queued (sql, params) writes in a single transaction, so a burst of
+    requests shares one commit. If the batch fails, writes are retried one
+    by one so only the bad ones fail.
+    """
+    with connection() as conn:
+        try:
+            with transaction(conn):
+                return [conn.execute(*item).lastrowid if item else None for item in writes]
+        except sqlite3.Error:
+            results = []
+            for item in writes:
+                try:
+                    with transaction(conn):
+                        results.append(conn.execute(*item).lastrowid if item else None)
+                except sqlite3.Error as e:
+                    results.append(e)
+            return results
+
+
+writer = BatchScheduler(_write_batch, max_batch_size=WRITE_BATCH_SIZE, max_wait=WRITE_MAX_WAIT,
+                        max_queue=WRITE_MAX_QUEUE, name="db-writer")
+_has_writes = False
+
+
+def _log_failure(future):
+    result = future.exception() or future.result()
+    if isinstance(result, Exception):
+        print(f"Error writing to {DATABASE}: {result}")
+
+
+def write(sql, params=()):
+    """
+    Queue a write for the background writer and return its Future without
+    waiting for the commit. Raises queue.Full when the writer is saturated.
+    """
+    global _has_writes
+    _has_writes = True
+    future = writer.submit((sql, params))
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def flush(timeout=10):
+    # Writes run in order, so once this no-op is done everything queued before it is too
+    if not _has_writes:
+        return
+    try:
+        writer(None, timeout=timeout)
+    except Exception as e:
+        print(f"Error flushing {DATABASE} writes: {e}")
+
+
+atexit.register(flush)
+
+
+def save_verification(session_id, verification, user_id=None, agent_id=None):
+    # Insert or update the session's row; returns the write's Future
+    now = time.time()
+    values = [int(bool(verification.get(field, False))) for field in VERIFICATION_FIELDS]
+    columns = ", ".join(VERIFICATION_FIELDS)
+    placeholders = ", ".join("?" * len(VERIFICATION_FIELDS))
+    updates = ", ".join(f"{field} = excluded.{field}" for field in VERIFICATION_FIELDS)
+    return write(
+        f"""
+        INSERT INTO verification_sessions
+            (session_id, user_id, agent_id, {columns}, created_at, updated_at)
+        VALUES (?, ?, ?, {placeholders}, ?, ?)
+        ON CONFLICT (session_id) DO UPDATE SET
+            user_id = COALESCE(excluded.user_id, user_id),
+            agent_id = COALESCE(excluded.agent_id, agent_id),
+            {updates},
+            updated_at = excluded.updated_at
+        """,
+        (session_id, user_id, agent_id, *values, now, now),
+    )
+
+
+def latest_verification(session_id=None, user_id=None, agent_id=None):
+    # Most recently updated session, optionally for one session, user or agent (indexed lookups)
+    with connection() as conn:
+        if session_id is not None:
+            row = conn.execute("SELECT * FROM verification_sessions WHERE session_id = ?",
+                               (session_id,)).fetchone()
+        elif user_id is not None:
+            row = conn.execute("SELECT * FROM verification_sessions WHERE user_id = ? "
+                               "ORDER BY updated_at DESC, id DESC LIMIT 1", (user_id,)).fetchone()
+        elif agent_id is not None:
+            row = conn.execute("SELECT * FROM verification_sessions WHERE agent_id = ? "
+                               "ORDER BY updated_at DESC, id DESC LIMIT 1", (agent_id,)).fetchone()
+        else:
+            row = conn.execute("SELECT * FROM verification_sessions "
+                               "ORDER BY updated_at DESC, id DESC LIMIT 1").fetchone()
+    return dict(row) if row else None
@@ -0,0 +1,115 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+# Model inference, ffmpeg and NumPy release the GIL, so threads keep the cores
+# busy without each worker process holding a second copy of the models.
+CPU_WORKERS = int(os.environ.get("CPU_WORKERS", os.cpu_count() or 4))
+
+# route -> (max requests running or queued at once, seconds to wait for a result)
+ROUTE_LIMITS = {
+    "verify-voice": (8, 10.0),
+    "enroll-voice": (2, 30.0),
+    "identify-voice": (8, 10.0),
+    "verify-face": (4, 5.0),
+    "enroll-face": (2, 10.0),
+    "audio-stream": (16, 5.0),  # one live audio chunk (MFCCs, classifier, speaker embedding)
+}
+DEFAULT_LIMIT = (4, 10.0)
+
+
+class Overloaded(Exception):
+    # The route already has its limit of requests in flight
+    pass
+
+
+class BoundedExecutor:
+    """
+    Runs CPU-bound work off the request/socket threads in one shared pool.
+
+    Each route has its own concurrency limit, so a burst on one endpoint
+    cannot take every worker, and a timeout after which the caller gets
+    TimeoutError. A timed-out task keeps its slot until it really finishes,
+    so the limit bounds actual work, not just waiting callers.
+    """
+
+    def __init__(self, workers=CPU_WORKERS, limits=ROUTE_LIMITS, default=DEFAULT_LIMIT):
+        self.workers = workers
+        self.limits = dict(limits)
+        self.default = default
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._stats = {}
+
+    def _get_pool(self):
+        # Created in the serving process; a pool inherited across fork has no threads
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cpu")
+                    self._pid = os.getpid()
+        return self._pool
+
+    def _route(self, route):
+        with self._lock:
+            if route not in self._slots:
+                limit, _ = self.limits.get(route, self.default)
+                self._slots[route] = threading.BoundedSemaphore(limit)
+                self._stats[route] = {"in_flight": 0, "completed": 0, "rejected": 0, "timed_out": 0, "failed": 0}
+            return self._slots[route], self._stats[route]
+
+    def run(self, route, fn, *args, timeout=None, **kwargs):
+        """
+        Run fn(*args, **kwargs) in the pool and wait for its result.
+        Raises Overloaded when the route is at its limit and TimeoutError
+        when the result takes longer than the route's timeout.
+        """
+        slots, stats = self._route(route)
+        if timeout is None:
+            _, timeout = self.limits.get(route, self.default)
+        if not slots.acquire(blocking=False):
+            with self._lock:
+                stats["rejected"] += 1
+            raise Overloaded(f"{route} is at its limit of concurrent requests")
+        with self._lock:
+            stats["in_flight"] += 1
+
+        def release(_=None):
+            with self._lock:
+                stats["in_flight"] -= 1
+            slots.release()
+
+        try:
+            future = self._get_pool().submit(fn, *args, **kwargs)
+        except BaseException:
+            release()
+            raise
+        future.add_done_callback(release)
+        try:
+            result = future.result(timeout)
+        except TimeoutError:
+            with self._lock:
+                stats["timed_out"] += 1
+            raise
+        except Exception:
+            with self._lock:
+                stats["failed"] += 1
+            raise
+        with self._lock:
+            stats["completed"] += 1
+        return result
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "routes": {
+                    route: dict(stats, limit=self.limits.get(route, self.default)[0])
+                    for route, stats in self._stats.items()
+                },
+            }
+
+
+executor = BoundedExecutor()
@@ -2,14 +2,18 @@ import cv2
 
 import time
 import face_recognition
-print(face_recognition.__file__)
+
+from face_gallery import FaceGallery
+from face_tracker import FaceTracker
+gallery = FaceGallery()
+
 def get_face_encoding(image_path):
-    image = face_recognition.load_image_file(image_path)
-    encodings = face_recognition.face_encodings(image)
-    if not encodings:
+    # Encoded once per image content, then served from the gallery
+    try:
+        return gallery.enroll(image_path, image_path)
+    except ValueError:
         print("No face found in reference image.")
         return None
-    return encodings[0]
 
 def is_face_in_video(ref_image_path, duration=5):
     ref_encoding = get_face_encoding(ref_image_path)
@@ -23,6 +27,7 @@ def is_face_in_video(ref_image_path, duration=5):
 
     start_time = time.time()
     found = False
+    tracker = FaceTracker()
 
     while time.time() - start_time < duration:
         ret, frame = cap.read()
@@ -33,14 +38,16 @@ def is_face_in_video(ref_image_path, duration=5):
         small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
         rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
 
-        face_locations = face_recognition.face_locations(rgb_small_frame)
-        face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-
-        for encoding in face_encodings:
-            match = face_recognition.compare_faces([ref_encoding], encoding, tolerance=0.5)
-            if match[0]:
-                found = True
-                break
+        # Full detection only every few frames; faces are tracked in between
+        tracker.update(rgb_small_frame)
+        pending = tracker.pending()
+        if pending:
+            # One encoding per track, not per frame
+            face_encodings = face_recognition.face_encodings(rgb_small_frame, [t.box for t in pending])
+            for track, encoding in zip(pending, face_encodings):
+                track.encoding = encoding
+            match, _ = gallery.match(face_encodings, tolerance=0.5, name=ref_image_path)
+            found = match is not None
 
         cv2.imshow('Webcam', frame)
         if cv2.waitKey(1) & 0xFF == 27 or found:
@@ -50,4 +57,6 @@ def is_face_in_video(ref_image_path, duration=5):
     cv2.destroyAllWindows()
     return found
 
-print(is_face_in_video("sriTarun.jpg"))
+if __name__ == "__main__":
+    print(is_face_in_video("sriTarun.jpg"))
+
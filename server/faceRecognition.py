@@ -1,16 +1,17 @@
 import face_recognition
 import cv2
 
+from face_gallery import FaceGallery
+
+gallery = FaceGallery()
+
 def is_john_present(john_image_path="john.png"):
-    # Load and encode the reference image
-    john_image = face_recognition.load_image_file(john_image_path)
-    john_encoding = face_recognition.face_encodings(john_image)
-    
-    if not john_encoding:
+    # Reference encoding is computed once per image content and kept in the gallery
+    try:
+        gallery.enroll("john", john_image_path)
+    except ValueError:
         print("No face found in john.png.")
         return False
-    
-    john_encoding = john_encoding[0]
 
     # Start webcam
     video_capture = cv2.VideoCapture(0)
@@ -25,12 +26,9 @@ def is_john_present(john_image_path="john.png"):
     face_locations = face_recognition.face_locations(frame)
     face_encodings = face_recognition.face_encodings(frame, face_locations)
 
-    for face_encoding in face_encodings:
-        # Compare to John's face
-        matches = face_recognition.compare_faces([john_encoding], face_encoding)
-        if True in matches:
-            return True
-
-    return False
+    # Compare every face in the frame to John's in one step
+    match, _ = gallery.match(face_encodings, name="john")
+    return match is not None
 
-print(is_john_present())
\ No newline at end of file
+if __name__ == "__main__":
+    print(is_john_present())
@@ -0,0 +1,220 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+GALLERY_DIR = "face_gallery"
+ENCODING_DIM = 128
+INITIAL_CAPACITY = 256
+TOLERANCE = 0.6  # face_recognition.compare_faces default
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FaceGallery:
+    """
+    Enrolled faces as one contiguous (N, 128) matrix of face encodings.
+
+    Reference images are encoded once per content hash, so the reference
+    side costs nothing per request. Matching computes the distances from any
+    number of probe faces to every enrolled identity in one vectorized step.
+
+    As in SpeakerStore, the matrix is a memory-mapped .npy file and row
+    assignments go to an append-only JSON-lines log, so an enrollment writes
+    one row and one line. Enrollments hold a file lock and every lookup
+    first applies log lines written since the last one, so several worker
+    processes can enroll into the same gallery and see each other's faces.
+    """
+
+    def __init__(self, root=GALLERY_DIR):
+        self.root = root
+        self.matrix_path = os.path.join(root, "encodings.npy")
+        self.log_path = os.path.join(root, "faces.jsonl")
+        self.lock_path = os.path.join(root, "enroll.lock")
+        self._lock = threading.RLock()
+        self.names = []
+        self.hashes = []
+        self.rows = {}
+        self._log_offset = 0
+        self._matrix = None
+        self._matrix_id = None
+        os.makedirs(root, exist_ok=True)
+        with self._lock, self._file_lock():
+            if not os.path.exists(self.matrix_path):
+                matrix = self._allocate(self.matrix_path, INITIAL_CAPACITY)
+                matrix.flush()
+                del matrix
+            self._follow()
+            legacy_path = f"{root}.npz"  # single-file gallery written by older versions
+            if not self.names and os.path.exists(legacy_path):
+                with np.load(legacy_path, allow_pickle=False) as data:
+                    for name, digest, encoding in zip(data["names"].tolist(), data["hashes"].tolist(),
+                                                      data["encodings"]):
+                        self._append(name, encoding, digest)
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        # Serializes enrollments across processes
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _allocate(self, path, capacity):
+        return np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(capacity, ENCODING_DIM))
+
+    def _map(self):
+        st = os.stat(self.matrix_path)
+        if self._matrix is None or self._matrix_id != (st.st_ino, st.st_size):
+            self._matrix = np.load(self.matrix_path, mmap_mode="r+")
+            self._matrix_id = (st.st_ino, st.st_size)
+
+    def _grow(self, needed):
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        tmp_path = f"{self.matrix_path}.{os.getpid()}.tmp"
+        grown = self._allocate(tmp_path, capacity)
+        grown[:len(self.names)] = self._matrix[:len(self.names)]
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self.matrix_path)
+        self._map()
+
+    def _follow(self):
+        # Apply log lines appended since the last call, by this or any other process
+        try:
+            size = os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            size = 0
+        if size == self._log_offset and self._matrix is not None:
+            return
+        entries = []
+        if size > self._log_offset:
+            with open(self.log_path, "rb") as f:
+                f.seek(self._log_offset)
+                data = f.read(size - self._log_offset)
+            end = data.rfind(b"\n") + 1  # only complete lines
+            entries = [json.loads(line) for line in data[:end].splitlines()]
+            self._log_offset += end
+        # A grown matrix is a new file; rows are written before their log line
+        self._map()
+        for entry in entries:
+            row = entry["row"]
+            if row == len(self.names):
+                self.names.append(entry["name"])
+                self.hashes.append(entry["hash"])
+            else:
+                self.hashes[row] = entry["hash"]
+            self.rows[entry["name"]] = row
+        self._index()
+
+    def _index(self):
+        # A copy, so a face re-enrolled in place can't change under a running match
+        self.encodings = np.array(self._matrix[:len(self.names)])
+        self.hash_rows = {digest: row for row, digest in enumerate(self.hashes) if digest}
+        self._sq_norms = np.sum(self.encodings ** 2, axis=1)
+        # Every enrollment appends to the shared log, so its length identifies
+        # the enrolled set in all processes; keys cached match results
+        self._version = str(self._log_offset)
+        # Swapped in as one tuple so a concurrent match sees a consistent gallery
+        self._state = (list(self.names), dict(self.rows), self.encodings, self._sq_norms)
+
+    def refresh(self):
+        with self._lock:
+            self._follow()
+            return self._state
+
+    @property
+    def version(self):
+        self.refresh()
+        return self._version
+
+    def __len__(self):
+        return len(self.refresh()[0])
+
+    def __contains__(self, name):
+        return name in self.refresh()[1]
+
+    def enroll(self, name, image_path):
+        """
+        Enroll (or refresh) name from a reference image and return its encoding.
+        The image is only decoded and encoded when its content is new.
+        """
+        digest = file_hash(image_path)
+        with self._lock:
+            self._follow()
+            row = self.rows.get(name)
+            if row is not None and self.hashes[row] == digest:
+                return self.encodings[row]
+            known = self.hash_rows.get(digest)
+            encoding = self.encodings[known] if known is not None else None
+        if encoding is None:
+            import face_recognition
+            image = face_recognition.load_image_file(image_path)
+            encodings = face_recognition.face_encodings(image)
+            if not encodings:
+                raise ValueError(f"No faces found in {image_path}.")
+            encoding = encodings[0]
+        self.enroll_encoding(name, encoding, digest)
+        return encoding
+
+    def enroll_encoding(self, name, encoding, digest=""):
+        with self._lock, self._file_lock():
+            self._follow()
+            self._append(name, encoding, digest)
+
+    def _append(self, name, encoding, digest):
+        # Caller holds both locks; catches up with its own line afterwards
+        row = self.rows.get(name)
+        if row is None:
+            row = len(self.names)
+            self._grow(row + 1)
+        self._matrix[row] = np.asarray(encoding, dtype=np.float64)
+        self._matrix.flush()
+        with open(self.log_path, "a") as f:
+            f.write(json.dumps({"name": name, "row": row, "hash": digest}) + "\n")
+        self._follow()
+
+    def distances(self, probes, state=None):
+        # Euclidean distances (M probes x N identities) via one matrix product
+        _, _, encodings, sq_norms = state or self.refresh()
+        probes = np.atleast_2d(np.asarray(probes, dtype=np.float64))
+        sq = np.sum(probes ** 2, axis=1)[:, np.newaxis] + sq_norms - 2 * probes @ encodings.T
+        return np.sqrt(np.maximum(sq, 0))
+
+    def match(self, probes, tolerance=TOLERANCE, name=None):
+        """
+        Best match for one or more probe encodings as (name, distance).
+        name is None when nothing is within tolerance. Pass name to only
+        consider one claimed identity.
+        """
+        state = self.refresh()
+        names, rows = state[0], state[1]
+        probes = np.asarray(probes, dtype=np.float64).reshape(-1, ENCODING_DIM)
+        if len(names) == 0 or len(probes) == 0:
+            return None, None
+        distances = self.distances(probes, state)
+        if name is not None:
+            if name not in rows:
+                raise KeyError(f"Face {name!r} is not enrolled")
+            best = float(distances[:, rows[name]].min())
+            return (name if best <= tolerance else None), best
+
+        probe, row = np.unravel_index(np.argmin(distances), distances.shape)
+        best = float(distances[probe, row])
+        return (names[row] if best <= tolerance else None), best
@@ -0,0 +1,102 @@
+import itertools
+
+import cv2
+
+import models
+
+DETECT_EVERY = 10  # full HOG detection every N frames
+MIN_CONFIDENCE = 0.6  # template match score below which a track is considered lost
+SEARCH_MARGIN = 0.5  # search window around the last box, as a fraction of its size
+MIN_IOU = 0.3
+
+
+def iou(a, b):
+    # Boxes are face_recognition (top, right, bottom, left)
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area = lambda box: (box[2] - box[0]) * (box[1] - box[3])
+    union = area(a) + area(b) - inter
+    return inter / union if union else 0.0
+
+
+class Track:
+    def __init__(self, track_id, box, template):
+        self.id = track_id
+        self.box = box
+        self.template = template
+        self.confidence = 1.0
+        self.encoding = None  # filled in once by the caller
+
+
+class FaceTracker:
+    """
+    Detect faces every `detect_every` frames and follow them in between with
+    normalized cross-correlation template matching around the last known box.
+
+    A track that drops below `min_confidence` (or leaves the frame) forces
+    full detection on the next frame. Tracks keep their identity across
+    re-detections (matched by IoU), so each one needs a single encoding.
+    Frames are expected to be the small RGB frames detection runs on.
+    """
+
+    def __init__(self, detect_every=DETECT_EVERY, min_confidence=MIN_CONFIDENCE):
+        self.detect_every = detect_every
+        self.min_confidence = min_confidence
+        self.tracks = []
+        self.frames_since_detect = None
+        self.detections = 0
+        self._ids = itertools.count()
+
+    def update(self, rgb_frame):
+        gray = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2GRAY)
+        if (self.frames_since_detect is None or self.frames_since_detect >= self.detect_every - 1
+                or not self.tracks):
+            self._detect(rgb_frame, gray)
+        elif not self._track(gray):
+            self._detect(rgb_frame, gray)
+        else:
+            self.frames_since_detect += 1
+        return self.tracks
+
+    def _detect(self, rgb_frame, gray):
+        self.detections += 1
+        self.frames_since_detect = 0
+        tracks = []
+        for box in models.get("face").face_locations(rgb_frame):
+            top, right, bottom, left = box
+            previous = max(self.tracks, key=lambda t: iou(t.box, box), default=None)
+            template = gray[top:bottom, left:right].copy()
+            if previous is not None and iou(previous.box, box) >= MIN_IOU:
+                previous.box, previous.template, previous.confidence = box, template, 1.0
+                self.tracks.remove(previous)
+                tracks.append(previous)
+            else:
+                tracks.append(Track(next(self._ids), box, template))
+        self.tracks = tracks
+
+    def _track(self, gray):
+        # Returns False when any track is lost and detection should run
+        height, width = gray.shape
+        for track in self.tracks:
+            top, right, bottom, left = track.box
+            h, w = track.template.shape
+            if h == 0 or w == 0:
+                return False
+            dy, dx = int(h * SEARCH_MARGIN), int(w * SEARCH_MARGIN)
+            y0, x0 = max(0, top - dy), max(0, left - dx)
+            y1, x1 = min(height, bottom + dy), min(width, right + dx)
+            window = gray[y0:y1, x0:x1]
+            if window.shape[0] < h or window.shape[1] < w:
+                return False
+            scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+            _, confidence, _, (x, y) = cv2.minMaxLoc(scores)
+            track.confidence = confidence
+            if confidence < self.min_confidence:
+                return False
+            track.box = (y0 + y, x0 + x + w, y0 + y + h, x0 + x)
+        return True
+
+    def pending(self):
+        # Tracks that still need their one encoding
+        return [track for track in self.tracks if track.encoding is None]
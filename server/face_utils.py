@@ -1,16 +1,29 @@
-import face_recognition
 import cv2
 import numpy as np
 import os
 
+import models
+from face_gallery import FaceGallery, TOLERANCE
+
+_gallery = None
+
+
+def get_gallery():
+    # Loaded on first use so importing this module stays cheap
+    global _gallery
+    if _gallery is None:
+        _gallery = FaceGallery()
+    return _gallery
+
 def load_image(image_path):
     # Load an image from file
+    face_recognition = models.get("face")
     image = face_recognition.load_image_file(image_path)
     return image
 
 def get_face_encoding(image):
     # Find all face encodings in the image
-    face_encoding = face_recognition.face_encodings(image)
+    face_encoding = models.get("face").face_encodings(image)
     
     if len(face_encoding) > 0:
         return face_encoding[0]  # Return the first face encoding
@@ -19,21 +32,21 @@ def get_face_encoding(image):
 
 def compare_faces(known_encoding, unknown_encoding):
     # Compare the known face encoding with the unknown encoding
-    results = face_recognition.compare_faces([known_encoding], unknown_encoding)
+    results = models.get("face").compare_faces([known_encoding], unknown_encoding)
     return results[0]
 
+def match_faces(unknown_encodings, name=None, tolerance=TOLERANCE):
+    # Best gallery match for the given encodings as (name, distance)
+    return get_gallery().match(unknown_encodings, tolerance=tolerance, name=name)
+
 def test_face_recognition(image1_path, image2_path):
     try:
-        # Load images
-        image1 = load_image(image1_path)
-        image2 = load_image(image2_path)
-
-        # Get face encodings
-        encoding1 = get_face_encoding(image1)
-        encoding2 = get_face_encoding(image2)
+        # Reference encoding comes from the gallery, encoded once per image content
+        get_gallery().enroll(image1_path, image1_path)
+        encoding2 = get_face_encoding(load_image(image2_path))
 
         # Compare the faces
-        match = compare_faces(encoding1, encoding2)
+        match, _ = match_faces(encoding2, name=image1_path)
 
         # Print result
         if match:
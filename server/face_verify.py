@@ -0,0 +1,182 @@
+import hashlib
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import models
+from face_utils import get_gallery
+from voice_classification.result_cache import ResultCache, bytes_hash
+
+DETECT_SCALE = 0.25  # detection runs on a quarter-size copy, as in faceRec.py
+DETECT_MAX_SIDE = 320  # ...or smaller for large photos, so HOG cost doesn't grow with resolution
+TOLERANCE = 0.5
+CONFIDENT_DISTANCE = 0.45  # stop at the first face this close to the claimed identity
+MAX_FRAMES = 30
+VIDEO_FRAME_STEP = 5  # sample every 5th frame of an uploaded clip
+DECODE_WORKERS = 4
+# Frames decoded ahead of the one being checked. Decoding (~20 ms) is much
+# cheaper than detection plus encoding, so one frame ahead hides it, and
+# with early exit more would mostly decode frames that are never looked at.
+DECODE_AHEAD = 1
+
+# cv2 releases the GIL while decoding, so threads decode frames in parallel
+decode_pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="face-decode")
+result_cache = ResultCache("face")
+
+
+def decode_jpeg(data):
+    if not data:
+        raise ValueError("Empty image")
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("Could not decode image")
+    return frame
+
+
+def video_frames(data, step=VIDEO_FRAME_STEP, max_frames=MAX_FRAMES):
+    # VideoCapture only reads from a path, so the clip goes through a temp file
+    with tempfile.NamedTemporaryFile(suffix=".video", delete=False) as f:
+        f.write(data)
+        path = f.name
+    try:
+        cap = cv2.VideoCapture(path)
+        frames, index = [], 0
+        while len(frames) < max_frames:
+            # grab() skips decoding frames we are not going to look at
+            if not cap.grab():
+                break
+            if index % step == 0:
+                ok, frame = cap.retrieve()
+                if ok:
+                    frames.append(frame)
+            index += 1
+        cap.release()
+    finally:
+        os.remove(path)
+    return frames
+
+
+def encode_image(data):
+    # Encoding of the largest face in an uploaded reference image
+    face_recognition = models.get("face")
+    rgb = cv2.cvtColor(decode_jpeg(data), cv2.COLOR_BGR2RGB)
+    locations = face_recognition.face_locations(rgb)
+    if not locations:
+        raise ValueError("No faces found in the image.")
+    largest = max(locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]))
+    return face_recognition.face_encodings(rgb, [largest])[0]
+
+
+def enroll_face(user_id, data):
+    gallery = get_gallery()
+    gallery.enroll_encoding(user_id, encode_image(data), hashlib.sha256(data).hexdigest())
+    return len(gallery)
+
+
+def verify_frames(frames, user_id=None, tolerance=TOLERANCE, confident=CONFIDENT_DISTANCE):
+    """
+    Match faces in a sequence of frames against the gallery.
+
+    frames is a list of encoded JPEG bytes (decoded in decode_pool,
+    DECODE_AHEAD frames ahead of the one being checked) or of already decoded BGR arrays.
+    Faces are located on a DETECT_SCALE copy of each frame, at most
+    DETECT_MAX_SIDE pixels on its longer side, and only those boxes are
+    encoded, at full resolution. Frames are checked in order and the loop stops at the first face within
+    `confident` of the claimed identity (or of anyone, without user_id).
+    Frames that fail to decode are skipped. Raises KeyError when user_id is
+    not enrolled and ValueError when no frame could be decoded.
+    """
+    start = time.perf_counter()
+    face_recognition = models.get("face")
+    gallery = get_gallery()
+    if user_id is not None and user_id not in gallery:
+        raise KeyError(f"Face {user_id!r} is not enrolled")
+
+    timings = {"decode_ms": 0.0, "detect_ms": 0.0, "encode_ms": 0.0, "match_ms": 0.0}
+    if frames and isinstance(frames[0], (bytes, bytearray)):
+        decoded = [decode_pool.submit(decode_jpeg, frames[0])]
+    else:
+        decoded = None
+
+    best_name, best_distance, checked, skipped = None, None, 0, 0
+    try:
+        for i in range(len(frames)):
+            t = time.perf_counter()
+            try:
+                frame = decoded[i].result() if decoded is not None else frames[i]
+            except ValueError:
+                # One corrupt frame in a burst shouldn't fail the whole check
+                skipped += 1
+                continue
+            finally:
+                timings["decode_ms"] += (time.perf_counter() - t) * 1000
+                # Only now queue the next frames, so they overlap detection
+                # instead of competing with the frame being waited on
+                while decoded is not None and len(decoded) < min(i + 1 + DECODE_AHEAD, len(frames)):
+                    decoded.append(decode_pool.submit(decode_jpeg, frames[len(decoded)]))
+            checked += 1
+
+            t = time.perf_counter()
+            detect_scale = min(DETECT_SCALE, DETECT_MAX_SIDE / max(frame.shape[:2]))
+            small = cv2.resize(frame, (0, 0), fx=detect_scale, fy=detect_scale)
+            small_locations = face_recognition.face_locations(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+            timings["detect_ms"] += (time.perf_counter() - t) * 1000
+            if not small_locations:
+                continue
+
+            t = time.perf_counter()
+            scale = 1 / detect_scale
+            locations = [tuple(int(v * scale) for v in box) for box in small_locations]
+            encodings = face_recognition.face_encodings(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), locations)
+            timings["encode_ms"] += (time.perf_counter() - t) * 1000
+
+            t = time.perf_counter()
+            name, distance = gallery.match(encodings, tolerance=tolerance, name=user_id)
+            timings["match_ms"] += (time.perf_counter() - t) * 1000
+            if distance is not None and (best_distance is None or distance < best_distance):
+                best_name, best_distance = name, distance
+            if best_distance is not None and best_distance <= confident:
+                break
+    finally:
+        if decoded is not None:
+            # Early exit: frames not yet decoded are dropped
+            for future in decoded:
+                future.cancel()
+
+    if checked == 0:
+        raise ValueError("No decodable frames received")
+
+    timings = {key: round(value, 2) for key, value in timings.items()}
+    timings["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return {
+        "is_match": best_name is not None,
+        "user_id": best_name,
+        "distance": best_distance,
+        "frames_checked": checked,
+        "frames_received": len(frames),
+        "frames_skipped": skipped,
+        "timings": timings,
+    }
+
+
+def verify_upload(frames, video=None, user_id=None, tolerance=TOLERANCE, confident=CONFIDENT_DISTANCE):
+    """
+    verify_frames() for an uploaded JPEG burst, or for a video clip when
+    frames is empty, answered from result_cache when the same upload was
+    already verified against the current gallery.
+    """
+    start = time.perf_counter()
+    result_cache.set_version(get_gallery().version)
+    upload_hash = bytes_hash("".join(bytes_hash(data) for data in frames).encode()) if frames else bytes_hash(video)
+    cache_key = result_cache.key(upload_hash, (tolerance, confident), user_id)
+    hit, cached = result_cache.get(cache_key)
+    if hit:
+        return dict(cached, cached=True, timings={"total_ms": round((time.perf_counter() - start) * 1000, 2)})
+
+    result = verify_frames(frames or video_frames(video), user_id=user_id, tolerance=tolerance, confident=confident)
+    result_cache.put(cache_key, {key: value for key, value in result.items() if key != "timings"})
+    return dict(result, cached=False)
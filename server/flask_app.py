@@ -1,10 +1,9 @@
-import sqlite3
+import uuid
 
-# Connect to SQLite database (it will create the file if it doesn't exist)
-conn = sqlite3.connect('users.db')
+import db
 
-# Create a cursor object to execute SQL commands
-cursor = conn.cursor()
+# Creates users.db (or upgrades it to the current schema) through the same
+# migrations the server runs, then records one sample verification session.
 
 data = {
     "first_name": "John",
@@ -15,35 +14,15 @@ data = {
     
 }
 
-# Create the table with the correct column types and no syntax errors
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY,
-        first_name TEXT,
-        middle_initial TEXT,
-        last_name TEXT,
-        last_four_digits TEXT,
-        zip_code TEXT,
-        human_voice BOOLEAN DEFAULT 0,
-        matching_voice BOOLEAN DEFAULT 0,
-        matching_face BOOLEAN DEFAULT 0
-    )
-''')
-
-# Optional: Insert sample data (with default values for booleans)
-cursor.execute('''
-    INSERT INTO users (first_name, middle_initial, last_name, last_four_digits, zip_code)
-    VALUES (?, ?, ?, ?, ?)
-''', (
-    data["first_name"],
-    data["middle_initial"],
-    data["last_name"],
-    data["last_four_digits"],
-    data["zip_code"]
-))
+# Same checks /userform applies
+verification = {
+    'first_name': data['first_name'] == 'John',
+    'middle_initial': data['middle_initial'] == 'D',
+    'last_name': data['last_name'] == 'Doe',
+    'last_four_digits': data['last_four_digits'] == '1234',
+    'zip_code': data['zip_code'] == '12345',
+}
 
-# Commit the changes and close the connection
-conn.commit()
-conn.close()
+db.save_verification(uuid.uuid4().hex, verification, user_id="sample").result(timeout=10)
 
-print("Database, table, and sample row created successfully.")
+print("Database, tables, and sample session created successfully.")
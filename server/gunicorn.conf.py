@@ -0,0 +1,35 @@
+import os
+
+# Production launch, from server/:
+#   gunicorn -c gunicorn.conf.py app:app
+#
+# The app is imported once in the master and when_ready() warms up the models
+# there before forking, so every worker shares the model weights copy-on-write.
+# Background threads (embedding batcher, DB writer, CPU pool, dashboard
+# pushes) are all started lazily on first use, i.e. inside each worker,
+# never in the master where fork would leave them behind.
+
+bind = os.environ.get("BIND", "0.0.0.0:5001")
+workers = int(os.environ.get("WEB_WORKERS", 2))
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", 32))  # mostly waiting on the CPU pool or websockets
+preload_app = True
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported, before workers are spawned
+    if os.environ.get("WARM_UP", "1") == "1":
+        import models
+        models.warm_up()
+
+
+def post_fork(server, worker):
+    # Split the cores between workers instead of each torch/BLAS pool claiming all of them
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
@@ -0,0 +1,102 @@
+import threading
+import time
+
+# Heavy libraries (torch, speechbrain, librosa, face_recognition/dlib) are
+# only imported inside the loaders below, so importing the app, a CLI or a
+# benchmark stays fast and each process pays for what it actually uses.
+
+SPEAKER_SOURCE = "speechbrain/spkrec-ecapa-voxceleb"
+SPEAKER_SAVEDIR = "pretrained_models/spkrec-ecapa-voxceleb"
+
+
+class ModelRegistry:
+    """
+    Named models constructed on first use and shared afterwards.
+
+    get() loads a model at most once, even when several requests ask for it
+    at the same time. warm_up() loads them ahead of traffic (e.g. in the
+    gunicorn master before forking) and status() reports what is loaded for
+    the readiness endpoint.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._status = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader, required=True):
+        with self._lock:
+            self._loaders[name] = (loader, required)
+            self._locks[name] = threading.Lock()
+            self._status[name] = {"loaded": False, "required": required, "load_seconds": None, "error": None}
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._locks[name]:
+            if name not in self._models:
+                loader, _ = self._loaders[name]
+                start = time.perf_counter()
+                try:
+                    self._models[name] = loader()
+                except Exception as e:
+                    self._status[name]["error"] = str(e)
+                    raise
+                self._status[name].update(loaded=True, error=None,
+                                          load_seconds=round(time.perf_counter() - start, 3))
+                print(f"Loaded {name} in {self._status[name]['load_seconds']}s")
+            return self._models[name]
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def warm_up(self, names=None):
+        # Load every registered model (or just names); failures are reported, not raised
+        for name in names or list(self._loaders):
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"Error loading {name}: {e}")
+        return self.status()
+
+    def status(self):
+        with self._lock:
+            return {name: dict(status) for name, status in self._status.items()}
+
+    def ready(self):
+        return all(status["loaded"] for status in self.status().values() if status["required"])
+
+
+def _load_speaker():
+    from speechbrain.inference.speaker import SpeakerRecognition
+    return SpeakerRecognition.from_hparams(source=SPEAKER_SOURCE, savedir=SPEAKER_SAVEDIR)
+
+
+def _load_voice_classifier():
+    from voice_classification.voice_classifier import classifier
+    classifier.load()
+    # Import librosa now so the first request doesn't pay for it (and numba's JIT setup)
+    import librosa  # noqa: F401
+    return classifier
+
+
+def _load_face():
+    import face_recognition
+    return face_recognition
+
+
+registry = ModelRegistry()
+registry.register("speaker", _load_speaker)
+registry.register("voice_classifier", _load_voice_classifier)
+registry.register("face", _load_face)
+
+
+def get(name):
+    return registry.get(name)
+
+
+def warm_up(names=None):
+    return registry.warm_up(names)
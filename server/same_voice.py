@@ -1,17 +1,140 @@
-from speechbrain.inference.speaker import SpeakerRecognition
+import numpy as np
+
+import models
+from batching import BatchScheduler
+from speaker_store import SpeakerStore
+from voice_classification.audio_io import TARGET_SR, decode_audio, load_audio
+from voice_classification.embedding_cache import ReferenceEmbedding
+from voice_classification.feature_cache import content_hash
+from voice_classification.result_cache import ResultCache, bytes_hash
+from voice_classification.vad import trim_silence
 
 threshold = 0.4
 pragyam_sample = "Tarun.wav"
 
-recognizer = SpeakerRecognition.from_hparams(
-    source="speechbrain/spkrec-ecapa-voxceleb",
-    savedir="pretrained_models/spkrec-ecapa-voxceleb"
+# Micro-batching of concurrent ECAPA forward passes
+USE_BATCHING = True
+BATCH_MAX_SIZE = 16
+BATCH_MAX_WAIT = 0.01  # seconds
+BATCH_MAX_QUEUE = 256
+EMBED_TIMEOUT = 30.0  # seconds
+MIN_EMBED_SECONDS = 0.1  # shorter signals (e.g. silence after VAD) are rejected before batching
+
+# Embed only the speech regions of each sample
+USE_VAD = True
+
+speaker_store = SpeakerStore()
+result_cache = ResultCache("same_voice")
+result_cache.set_version(f"{models.SPEAKER_SOURCE}:{'vad' if USE_VAD else 'full'}")
+
+
+def embed_signals(signals):
+    """
+    Compute L2-normalized ECAPA embeddings for a list of mono 16 kHz buffers
+    in one forward pass. Shorter signals are zero-padded and their relative
+    lengths passed to encode_batch so padding is ignored by the model.
+    """
+    import torch
+
+    recognizer = models.get("speaker")
+    lengths = np.array([len(signal) for signal in signals])
+    if lengths.min() == 0:
+        raise ValueError("Cannot embed an empty signal")
+    wavs = np.zeros((len(signals), lengths.max()), dtype=np.float32)
+    for i, signal in enumerate(signals):
+        wavs[i, :len(signal)] = signal
+    relative_lengths = (lengths / lengths.max()).astype(np.float32)
+    with torch.no_grad():
+        embeddings = recognizer.encode_batch(torch.from_numpy(wavs), torch.from_numpy(relative_lengths))
+    embeddings = embeddings.squeeze(1).cpu().numpy().astype(np.float32)
+    return list(embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True))
+
+
+embedding_scheduler = BatchScheduler(
+    embed_signals,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait=BATCH_MAX_WAIT,
+    max_queue=BATCH_MAX_QUEUE,
+    name="speaker-embedding",
 )
 
-def same_voice(voice_sample_path):
-    score, _ = recognizer.verify_files(pragyam_sample, voice_sample_path)
-    print(f"Score: {score.item():.4f}")
-    return score.item() > threshold
+
+def embed_signal(audio):
+    """
+    Compute the L2-normalized ECAPA embedding of a mono 16 kHz float32 buffer.
+    Raises ValueError when it holds less than MIN_EMBED_SECONDS of audio and
+    queue.Full when the batching queue is saturated.
+    """
+    if len(audio) < MIN_EMBED_SECONDS * TARGET_SR:
+        raise ValueError("Not enough speech in the audio sample")
+    if USE_BATCHING:
+        return embedding_scheduler(audio, timeout=EMBED_TIMEOUT)
+    return embed_signals([audio])[0]
+
+
+def embed_sample(sample):
+    # A path on disk, raw uploaded bytes or an already decoded 16 kHz buffer
+    if isinstance(sample, str):
+        sample, _ = load_audio(sample)
+    elif isinstance(sample, (bytes, bytearray)):
+        sample, _ = decode_audio(sample)
+    if USE_VAD:
+        sample, _ = trim_silence(sample, TARGET_SR)
+    return embed_signal(sample)
+
+
+_reference = ReferenceEmbedding(embed_sample, "vad" if USE_VAD else "full")
+
+
+def reference_embedding(path=pragyam_sample):
+    """
+    Return the cached embedding of the reference sample (see
+    voice_classification.embedding_cache for how it is cached).
+    """
+    return _reference.get(path)
+
+
+def enroll_speaker(user_id, samples, replace=False):
+    embeddings = np.stack([embed_sample(sample) for sample in samples])
+    return speaker_store.enroll(user_id, embeddings, replace=replace)
+
+
+def identify_speaker(voice_sample, k=5):
+    return speaker_store.search(embed_sample(voice_sample), k=k)
+
+
+def _sample_hash(sample):
+    if isinstance(sample, str):
+        return content_hash(sample)
+    if isinstance(sample, (bytes, bytearray)):
+        return bytes_hash(sample)
+    return bytes_hash(np.ascontiguousarray(sample, dtype=np.float32).tobytes())
+
+
+def same_voice(voice_sample, user_id=None):
+    """
+    Compare a sample (path, uploaded bytes or 16 kHz buffer) against the enrolled speaker user_id,
+    or against the fixed reference sample when no user is given.
+    Repeated samples are answered from result_cache without decoding or embedding them again.
+    """
+    if user_id is None:
+        target = reference_embedding()
+    else:
+        target = speaker_store.embedding(user_id)
+        if target is None:
+            raise KeyError(f"Speaker {user_id!r} is not enrolled")
+    # Keyed on the enrolled embedding too, so re-enrolling a user is never served stale scores
+    cache_key = result_cache.key(_sample_hash(voice_sample), threshold, bytes_hash(target.tobytes()))
+    hit, score = result_cache.get(cache_key)
+    if not hit:
+        probe = embed_sample(voice_sample)
+        if user_id is None:
+            score = float(np.dot(target, probe))
+        else:
+            score = speaker_store.verify(user_id, probe)
+        result_cache.put(cache_key, score)
+    print(f"Score: {score:.4f}")
+    return score > threshold
 
 if __name__ == "__main__":
     print(same_voice("sample.wav"))  # only runs when directly executed
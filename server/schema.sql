@@ -1,12 +1,46 @@
+-- Reference copy of the current schema (user_version 3).
+-- The database is created and upgraded by the migrations in db.py; change
+-- the schema there and mirror it here.
 
-            CREATE TABLE IF NOT EXISTS users (
-                first_name BOOLEAN DEFAULT 0,
-                middle_initial BOOLEAN DEFAULT 0,
-                last_name BOOLEAN DEFAULT 0,
-                last_four_digits BOOLEAN DEFAULT 0,
-                zip_code BOOLEAN DEFAULT 0,
-                human_voice BOOLEAN DEFAULT 0,
-                matching_voice BOOLEAN DEFAULT 0,
-                matching_face BOOLEAN DEFAULT 0
-            )
-        
\ No newline at end of file
+CREATE TABLE IF NOT EXISTS users (
+    first_name BOOLEAN DEFAULT 0,
+    middle_initial BOOLEAN DEFAULT 0,
+    last_name BOOLEAN DEFAULT 0,
+    last_four_digits BOOLEAN DEFAULT 0,
+    zip_code BOOLEAN DEFAULT 0,
+    human_voice BOOLEAN DEFAULT 0,
+    matching_voice BOOLEAN DEFAULT 0,
+    matching_face BOOLEAN DEFAULT 0
+);
+
+CREATE TABLE verification_sessions (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL UNIQUE,
+    user_id TEXT,
+    agent_id TEXT,
+    first_name INTEGER NOT NULL DEFAULT 0,
+    middle_initial INTEGER NOT NULL DEFAULT 0,
+    last_name INTEGER NOT NULL DEFAULT 0,
+    last_four_digits INTEGER NOT NULL DEFAULT 0,
+    zip_code INTEGER NOT NULL DEFAULT 0,
+    human_voice INTEGER NOT NULL DEFAULT 0,
+    matching_voice INTEGER NOT NULL DEFAULT 0,
+    matching_face INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE INDEX idx_sessions_user ON verification_sessions (user_id, updated_at);
+CREATE INDEX idx_sessions_agent ON verification_sessions (agent_id, updated_at);
+CREATE INDEX idx_sessions_updated ON verification_sessions (updated_at);
+
+CREATE TABLE verification_aggregates (
+    hour INTEGER NOT NULL,
+    agent_id TEXT NOT NULL DEFAULT '',
+    check_name TEXT NOT NULL,
+    passed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, agent_id, check_name)
+) WITHOUT ROWID;
+
+CREATE INDEX idx_aggregates_agent ON verification_aggregates (agent_id, hour);
@@ -0,0 +1,243 @@
+import contextlib
+import fcntl
+import json
+import os
+import threading
+
+import numpy as np
+
+EMBEDDING_DIM = 192  # ECAPA-TDNN (spkrec-ecapa-voxceleb) embedding size
+STORE_DIR = "speaker_store"
+INITIAL_CAPACITY = 1024
+
+
+def normalize(embeddings):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+def _file_identity(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size
+
+
+class SpeakerStore:
+    """
+    Enrolled speakers as one float32 matrix of L2-normalized embeddings.
+
+    The matrix lives in a memory-mapped .npy file (row i = speaker i) and the
+    row assignment in an append-only JSON-lines log, so an enrollment is O(1)
+    on disk and a lookup is a single matrix-vector product over mapped pages.
+    A second mapped matrix keeps each speaker's unnormalized sum of sample
+    embeddings, so re-enrollment weighs every sample equally; only the
+    normalized centroid is used for scoring.
+
+    As in FaceGallery, enrollments hold a file lock and every lookup first
+    applies log lines written since the last one, so several worker
+    processes can enroll into the same store and see each other's speakers.
+    """
+
+    def __init__(self, root=STORE_DIR, dim=EMBEDDING_DIM):
+        self.root = root
+        self.dim = dim
+        self.matrix_path = os.path.join(root, "embeddings.npy")
+        self.sums_path = os.path.join(root, "sums.npy")
+        self.log_path = os.path.join(root, "speakers.jsonl")
+        self.lock_path = os.path.join(root, "enroll.lock")
+        self._lock = threading.RLock()
+        self.reload()
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        # Serializes enrollments across processes
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def reload(self):
+        # Forget everything and replay the log from the start
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            self.user_ids = []
+            self.rows = {}
+            self.counts = []
+            self._log_offset = 0
+            self._matrix = self._sums = None
+            self._mapped = None
+            with self._file_lock():
+                if not os.path.exists(self.matrix_path):
+                    matrix = self._allocate(self.matrix_path, INITIAL_CAPACITY)
+                    matrix.flush()
+                    del matrix
+                self._follow(force=True)
+                if not os.path.exists(self.sums_path):
+                    # Stores written before sums were kept: centroid * count is the best estimate
+                    sums = self._allocate(self.sums_path, self._matrix.shape[0])
+                    n = len(self.user_ids)
+                    sums[:n] = self._matrix[:n] * np.asarray(self.counts, dtype=np.float32)[:, np.newaxis]
+                    sums.flush()
+                    del sums
+                    self._map()
+
+    def _map(self):
+        # Another process may have grown (replaced) the files since they were mapped
+        identity = [_file_identity(path) for path in (self.matrix_path, self.sums_path)]
+        if identity != self._mapped:
+            self._matrix = np.load(self.matrix_path, mmap_mode="r+")
+            self._sums = np.load(self.sums_path, mmap_mode="r+") if identity[1] else None
+            self._mapped = identity
+
+    def _follow(self, force=False):
+        # Apply log lines appended since the last call, by this or any other process
+        try:
+            size = os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            size = 0
+        if size == self._log_offset and not force:
+            return
+        if size > self._log_offset:
+            with open(self.log_path, "rb") as f:
+                f.seek(self._log_offset)
+                data = f.read(size - self._log_offset)
+            end = data.rfind(b"\n") + 1  # only complete lines
+            for line in data[:end].splitlines():
+                entry = json.loads(line)
+                row = entry["row"]
+                if row == len(self.user_ids):
+                    self.user_ids.append(entry["user_id"])
+                    self.counts.append(0)
+                self.rows[entry["user_id"]] = row
+                self.counts[row] = entry["count"]
+            self._log_offset += end
+        # Rows are written before their log line, so they are in the files now
+        self._map()
+
+    def refresh(self):
+        with self._lock:
+            self._follow()
+
+    def __len__(self):
+        self.refresh()
+        return len(self.user_ids)
+
+    def __contains__(self, user_id):
+        self.refresh()
+        return user_id in self.rows
+
+    def _allocate(self, path, capacity):
+        return np.lib.format.open_memmap(
+            path, mode="w+", dtype=np.float32, shape=(capacity, self.dim)
+        )
+
+    def _grow(self, needed):
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self._grow_file(self.matrix_path, self._matrix, capacity)
+        self._grow_file(self.sums_path, self._sums, capacity)
+        self._map()
+
+    def _grow_file(self, path, array, capacity):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        grown = self._allocate(tmp_path, capacity)
+        grown[:len(array)] = array
+        grown.flush()
+        del grown
+        array.flush()
+        os.replace(tmp_path, path)
+
+    def enroll(self, user_id, embeddings, replace=False):
+        """
+        Enroll user_id with one or more embeddings (shape (dim,) or (n, dim)).
+        Re-enrolling folds the new samples into the existing centroid unless
+        replace=True. Returns the number of samples behind the centroid.
+        """
+        return self.enroll_many([(user_id, embeddings)], replace=replace)[0]
+
+    def enroll_many(self, items, replace=False):
+        with self._lock, self._file_lock():
+            self._follow()
+            rows, counts_by_row = dict(self.rows), {}
+            next_row = len(self.user_ids)
+            entries, counts = [], []
+            for user_id, embeddings in items:
+                embeddings = normalize(np.atleast_2d(embeddings))
+                if embeddings.shape[1] != self.dim:
+                    raise ValueError(f"Expected {self.dim}-dim embeddings, got {embeddings.shape[1]}")
+
+                row = rows.get(user_id)
+                if row is None:
+                    row = rows[user_id] = next_row
+                    next_row += 1
+                    self._grow(next_row)
+                    counts_by_row[row] = 0
+                previous = counts_by_row.get(row, self.counts[row] if row < len(self.counts) else 0)
+
+                count = 0 if replace else previous
+                total = embeddings.sum(axis=0)
+                if count:
+                    total += self._sums[row]
+                count += len(embeddings)
+                self._sums[row] = total
+                self._matrix[row] = normalize(total)
+                counts_by_row[row] = count
+                entries.append({"user_id": user_id, "row": row, "count": count})
+                counts.append(count)
+
+            self._matrix.flush()
+            self._sums.flush()
+            with open(self.log_path, "a") as f:
+                f.writelines(json.dumps(entry) + "\n" for entry in entries)
+            # Catch up with our own lines, like any other process will
+            self._follow()
+            return counts
+
+    def matrix(self):
+        with self._lock:
+            self._follow()
+            return self._matrix[:len(self.user_ids)]
+
+    def embedding(self, user_id):
+        with self._lock:
+            self._follow()
+            row = self.rows.get(user_id)
+            if row is None:
+                return None
+            return np.array(self._matrix[row])
+
+    def verify(self, user_id, probe):
+        """
+        Cosine score of a probe embedding against one claimed identity,
+        or None if the user is not enrolled.
+        """
+        with self._lock:
+            self._follow()
+            row = self.rows.get(user_id)
+            if row is None:
+                return None
+            return float(self._matrix[row] @ normalize(probe))
+
+    def search(self, probe, k=5):
+        """
+        Top-k enrolled speakers for a probe embedding as (user_id, score),
+        best first.
+        """
+        with self._lock:
+            self._follow()
+            n = len(self.user_ids)
+            if n == 0:
+                return []
+            scores = self._matrix[:n] @ normalize(probe)
+            k = min(k, n)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self.user_ids[i], float(scores[i])) for i in top]
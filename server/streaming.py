@@ -0,0 +1,212 @@
+import numpy as np
+import soxr
+
+import same_voice
+from voice_classification.audio_io import TARGET_SR
+from voice_classification.features import HOP_LENGTH, N_FFT, N_MELS, N_MFCC
+from voice_classification.vad import trim_silence
+from voice_classification.voice_classifier import MAX_LEN, classifier
+
+SCORE_INTERVAL = 0.5  # seconds of audio between deepfake scores
+TOP_DB = 80.0  # librosa.power_to_db default, as used in training
+AMIN = 1e-10
+MAX_CHUNK_SECONDS = 5.0  # larger chunks are rejected to keep memory bounded
+
+# Incremental speaker verification
+SEGMENT_SECONDS = 1.0  # voiced audio per embedding update
+MIN_DECISION_SECONDS = 2.0  # voiced audio required before an early decision
+DECISION_MARGIN = 0.1  # distance from the threshold needed to decide early
+DECISION_PATIENCE = 2  # consecutive segments that must agree
+MAX_VOICED_SECONDS = 10.0  # decide on the last score after this much speech
+
+
+class DeepfakeStream:
+    """
+    Rolling deepfake score over live PCM audio for one connection.
+
+    Keeps only the samples not yet covered by a full STFT frame and the last
+    MAX_LEN mel power frames, so memory stays constant however long the call
+    runs. Each chunk computes mel frames for the new samples only and shifts
+    them into the window; every SCORE_INTERVAL seconds of audio the window is
+    converted to MFCCs and scored with the shared classifier.
+
+    The dB conversion is done on the whole window, clipped TOP_DB below the
+    loudest frame heard so far, as power_to_db does over a whole clip in
+    training; converting each chunk on its own would clip relative to that
+    chunk instead. Frames are computed without centre padding, so the window
+    equals the offline MFCC frames except the two at each edge of the clip.
+    """
+
+    def __init__(self, sample_rate, score_interval=SCORE_INTERVAL):
+        self.sample_rate = sample_rate
+        self.score_every = int(score_interval * sample_rate)
+        self.max_chunk = int(MAX_CHUNK_SECONDS * sample_rate)
+        self.samples_seen = 0
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._frames = np.zeros((N_MELS, MAX_LEN), dtype=np.float32)
+        self._filled = 0
+        self._peak = AMIN
+        self._since_score = 0
+
+    def push(self, samples):
+        """
+        Add a chunk of mono float32 samples.
+        Returns a score dict when one is due, otherwise None.
+        """
+        if len(samples) > self.max_chunk:
+            raise ValueError(f"Audio chunk longer than {MAX_CHUNK_SECONDS} s")
+
+        self._pending = np.concatenate([self._pending, samples])
+        if len(self._pending) >= N_FFT:
+            n_frames = 1 + (len(self._pending) - N_FFT) // HOP_LENGTH
+            used = (n_frames - 1) * HOP_LENGTH + N_FFT
+            import librosa  # deferred like in features.py
+            mel = librosa.feature.melspectrogram(
+                y=self._pending[:used], sr=self.sample_rate, n_mels=N_MELS,
+                n_fft=N_FFT, hop_length=HOP_LENGTH, center=False,
+            )
+            self._peak = max(self._peak, float(mel.max()))
+            self._append(mel)
+            self._pending = self._pending[n_frames * HOP_LENGTH:]
+
+        self.samples_seen += len(samples)
+        self._since_score += len(samples)
+        if self._since_score >= self.score_every and self._filled:
+            self._since_score = 0
+            return self.score()
+        return None
+
+    def _append(self, mel):
+        n = mel.shape[1]
+        if n >= MAX_LEN:
+            self._frames[:] = mel[:, -MAX_LEN:]
+        else:
+            self._frames[:, :-n] = self._frames[:, n:]
+            self._frames[:, -n:] = mel
+        self._filled = min(MAX_LEN, self._filled + n)
+
+    def window(self):
+        """
+        MFCCs of the last MAX_LEN frames, zero-padded at the end until that
+        many frames arrived, like training.
+        """
+        import librosa
+        frames = self._frames[:, MAX_LEN - self._filled:]
+        log_mel = 10.0 * np.log10(np.maximum(AMIN, frames))
+        log_mel = np.maximum(log_mel, 10.0 * np.log10(self._peak) - TOP_DB)
+        mfcc = librosa.feature.mfcc(S=log_mel, n_mfcc=N_MFCC)
+        return np.pad(mfcc, ((0, 0), (0, MAX_LEN - self._filled)), mode='constant')
+
+    def score(self):
+        label, ai_probability = classifier.predict(self.window())
+        return {
+            "label": label,
+            "ai_probability": ai_probability,
+            "threshold": classifier.threshold,
+            "frames": self._filled,
+            "seconds": self.samples_seen / self.sample_rate,
+        }
+
+
+def voiced_samples(samples, sample_rate):
+    # Chunks are short, so gate on the absolute floor only rather than
+    # relative to the loudest frame of the chunk
+    speech, segments = trim_silence(samples, sample_rate, relative_db=None)
+    return speech if segments else samples[:0]
+
+
+class SpeakerStream:
+    """
+    Incremental speaker verification over live PCM audio for one connection.
+
+    Voiced audio is collected into SEGMENT_SECONDS segments. Each segment is
+    embedded once and folded into a duration-weighted running embedding,
+    which is scored against the claimed user (or the reference sample).
+    Once MIN_DECISION_SECONDS of speech has been heard and DECISION_PATIENCE
+    consecutive scores sit at least DECISION_MARGIN above or below the
+    threshold, the stream decides and stops computing embeddings.
+    """
+
+    def __init__(self, user_id=None, sample_rate=TARGET_SR, threshold=None):
+        if user_id is None:
+            self.reference = same_voice.reference_embedding()
+        else:
+            self.reference = same_voice.speaker_store.embedding(user_id)
+            if self.reference is None:
+                raise KeyError(f"Speaker {user_id!r} is not enrolled")
+        self.user_id = user_id
+        self.threshold = same_voice.threshold if threshold is None else threshold
+        self.max_chunk = int(MAX_CHUNK_SECONDS * sample_rate)
+        self._resampler = None
+        if sample_rate != TARGET_SR:
+            self._resampler = soxr.ResampleStream(sample_rate, TARGET_SR, 1, dtype='float32')
+
+        self.segment_length = int(SEGMENT_SECONDS * TARGET_SR)
+        self._segment = np.zeros(0, dtype=np.float32)
+        self._embedding_sum = np.zeros_like(self.reference)
+        self.speech_seconds = 0.0
+        self.score = None
+        self.decision = None
+        self._streak = 0
+        self._streak_sign = 0
+
+    def push(self, samples):
+        """
+        Add a chunk of mono float32 samples.
+        Returns a result dict after each embedded segment, otherwise None.
+        """
+        if self.decision is not None:
+            return None
+        if len(samples) > self.max_chunk:
+            raise ValueError(f"Audio chunk longer than {MAX_CHUNK_SECONDS} s")
+
+        if self._resampler is not None:
+            samples = self._resampler.resample_chunk(samples)
+        self._segment = np.concatenate([self._segment, voiced_samples(samples, TARGET_SR)])
+        if len(self._segment) < self.segment_length:
+            return None
+
+        segment = self._segment[:self.segment_length]
+        self._segment = self._segment[self.segment_length:]
+        return self._update(segment)
+
+    def _update(self, segment):
+        seconds = len(segment) / TARGET_SR
+        self._embedding_sum += same_voice.embed_signal(segment) * seconds
+        self.speech_seconds += seconds
+        running = self._embedding_sum / np.linalg.norm(self._embedding_sum)
+        self.score = float(running @ self.reference)
+
+        sign = 0
+        if self.score >= self.threshold + DECISION_MARGIN:
+            sign = 1
+        elif self.score <= self.threshold - DECISION_MARGIN:
+            sign = -1
+        self._streak = self._streak + 1 if sign and sign == self._streak_sign else int(bool(sign))
+        self._streak_sign = sign
+
+        if self.speech_seconds >= MIN_DECISION_SECONDS and self._streak >= DECISION_PATIENCE:
+            self.decision = "accept" if sign > 0 else "reject"
+        elif self.speech_seconds >= MAX_VOICED_SECONDS:
+            self.decision = "accept" if self.score > self.threshold else "reject"
+        return self.result()
+
+    def finish(self):
+        # Decide on whatever speech arrived, e.g. when the caller hangs up
+        if self.decision is None:
+            if len(self._segment) >= TARGET_SR // 2:
+                self._update(self._segment)
+                self._segment = self._segment[:0]
+            if self.decision is None and self.score is not None:
+                self.decision = "accept" if self.score > self.threshold else "reject"
+        return self.result()
+
+    def result(self):
+        return {
+            "user_id": self.user_id,
+            "score": self.score,
+            "threshold": self.threshold,
+            "speech_seconds": self.speech_seconds,
+            "decision": self.decision,
+            "is_match": None if self.decision is None else self.decision == "accept",
+        }
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# Server modules are imported flat (import db, import speaker_store), as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    # A fresh database per test; the tracked users.db is never opened
+    monkeypatch.setattr(db, "DATABASE", str(tmp_path / "users.db"))
+    monkeypatch.setattr(db, "_has_writes", False)
+    pool = db.ConnectionPool()
+    monkeypatch.setattr(db, "_pool", pool)
+    yield pool
+    # Commit queued writes while the pool is still patched in; the atexit
+    # flush then finds nothing to do
+    db.flush()
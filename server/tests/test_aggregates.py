@@ -0,0 +1,89 @@
+import db
+from aggregates import VerificationAggregates
+
+PASS = {"human_voice": True, "matching_voice": True, "matching_face": True}
+FAIL = {}
+
+
+def counts(snapshot, check="human_voice"):
+    return snapshot["totals"][check]["passed"], snapshot["totals"][check]["failed"]
+
+
+def test_workers_converge_on_the_table(pool):
+    # Two workers of the same app, sharing one database
+    first = VerificationAggregates(refresh_interval=None)
+    second = VerificationAggregates(refresh_interval=None)
+    first.record(PASS, agent_id="a1", timestamp=0)
+    first.record(FAIL, agent_id="a1", timestamp=0)
+    second.record(PASS, agent_id="a2", timestamp=0)
+
+    # Each serves its own submissions at once, without double counting them after a reload
+    assert counts(first.snapshot()) == (1, 1)
+    first.reload()
+    assert counts(first.snapshot()) == (1, 1)
+
+    # Once both have refreshed, each one's submissions show up in both
+    second.reload()
+    first.reload()
+    assert counts(second.snapshot()) == (2, 1)
+    assert counts(first.snapshot()) == (2, 1)
+    assert second.snapshot(agent_id="a1")["agent"]["a1"]["human_voice"]["pass_rate"] == 0.5
+
+
+def test_snapshot_between_reloads_adds_recent_submissions(pool):
+    aggregates = VerificationAggregates(refresh_interval=None)
+    aggregates.record(PASS, timestamp=0)
+    assert counts(aggregates.snapshot()) == (1, 0)
+    aggregates.record(FAIL, timestamp=0)
+    aggregates.checkpoint()
+    assert counts(aggregates.snapshot()) == (1, 1)
+    aggregates.reload()
+    assert counts(aggregates.snapshot()) == (1, 1)
+
+
+def test_snapshot_does_not_touch_the_database(pool, monkeypatch):
+    aggregates = VerificationAggregates(refresh_interval=None)
+    aggregates.record(PASS, timestamp=0)
+    aggregates.reload()
+    aggregates.record(FAIL, timestamp=0)
+
+    def unavailable(*args, **kwargs):
+        raise AssertionError("snapshot queried the database")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db, "connection", unavailable)
+        patch.setattr(db, "flush", unavailable)
+        snapshot = aggregates.snapshot()
+    assert counts(snapshot) == (1, 1)
+    assert snapshot["as_of"] is not None
+
+
+def test_submission_during_reload_is_counted_once(pool, monkeypatch):
+    aggregates = VerificationAggregates(refresh_interval=None)
+    aggregates.record(PASS, timestamp=0)
+    write = db.write
+
+    def write_and_record(sql, params=()):
+        # A request submitting while the reload writes its checkpoint
+        if not getattr(write_and_record, "recorded", False):
+            write_and_record.recorded = True
+            aggregates.record(FAIL, timestamp=0)
+        return write(sql, params)
+
+    monkeypatch.setattr(db, "write", write_and_record)
+    aggregates.reload()
+    assert counts(aggregates.snapshot()) == (1, 1)
+    monkeypatch.setattr(db, "write", write)
+    aggregates.reload()
+    assert counts(aggregates.snapshot()) == (1, 1)
+
+
+def test_totals_survive_hours_outside_the_window(pool):
+    aggregates = VerificationAggregates(retain_hours=1, refresh_interval=None)
+    aggregates.record(PASS, agent_id="a1", timestamp=0)
+    aggregates.reload()
+    snapshot = VerificationAggregates(retain_hours=1, refresh_interval=None)
+    snapshot.reload()
+    assert counts(snapshot.snapshot()) == (1, 0)
+    assert snapshot.snapshot()["by_hour"] == {}
+    assert snapshot.snapshot(agent_id="a1")["agent"]["a1"]["human_voice"]["passed"] == 1
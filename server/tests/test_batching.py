@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from batching import BatchScheduler
+
+
+def test_batches_concurrent_requests_in_order():
+    calls = []
+
+    def double(items):
+        calls.append(len(items))
+        return [item * 2 for item in items]
+
+    scheduler = BatchScheduler(double, max_batch_size=8, max_wait=0.05)
+    futures = [scheduler.submit(i) for i in range(8)]
+    assert [future.result(5) for future in futures] == [i * 2 for i in range(8)]
+    assert sum(calls) == 8 and max(calls) > 1
+
+
+def test_timed_out_request_is_skipped():
+    release = threading.Event()
+    seen = []
+
+    def slow(items):
+        seen.extend(items)
+        release.wait(5)
+        return items
+
+    scheduler = BatchScheduler(slow, max_batch_size=1, max_wait=0)
+    blocker = scheduler.submit("first")
+    with pytest.raises(TimeoutError):
+        scheduler("abandoned", timeout=0.05)
+    release.set()
+    assert blocker.result(5) == "first"
+    assert scheduler("last", timeout=5) == "last"
+
+    assert "abandoned" not in seen
+    assert scheduler.metrics()["cancelled"] == 1
+
+
+def test_failed_batch_retries_items_one_by_one():
+    calls = []
+
+    def invert(items):
+        calls.append(list(items))
+        return [1 / item for item in items]
+
+    scheduler = BatchScheduler(invert, max_batch_size=8, max_wait=0.05)
+    futures = [scheduler.submit(item) for item in (1, 0, 4)]
+    assert futures[0].result(5) == 1
+    with pytest.raises(ZeroDivisionError):
+        futures[1].result(5)
+    assert futures[2].result(5) == 0.25
+    assert calls[0] == [1, 0, 4] and scheduler.metrics()["split_batches"] == 1
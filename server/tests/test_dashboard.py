@@ -0,0 +1,105 @@
+import dashboard
+import db
+from dashboard import DashboardHub, agent_room, payload
+
+
+class FakeManager:
+    def __init__(self):
+        self.delivered = []
+
+    def _handle_emit(self, message):
+        self.delivered.append(message)
+
+
+class FakeSocketIO:
+    def __init__(self):
+        self.server = type("Server", (), {})()
+        self.server.manager = FakeManager()
+        self.emitted = []
+
+    def emit(self, event, data, to=None):
+        self.emitted.append((event, data, to))
+
+    def start_background_task(self, target):
+        return None
+
+
+def count_queries(monkeypatch):
+    calls = []
+    latest_verification = db.latest_verification
+
+    def counting(**query):
+        calls.append(query)
+        return latest_verification(**query)
+
+    monkeypatch.setattr(db, "latest_verification", counting)
+    return calls
+
+
+def test_published_and_stored_state_have_one_shape(pool):
+    verification = {"first_name": True, "human_voice": 1, "matching_face": False}
+    db.save_verification("s1", verification, user_id="u1", agent_id="a1").result(5)
+
+    published = payload(dict(verification, session_id="s1", user_id="u1", agent_id="a1", updated_at=1.0))
+    stored = DashboardHub(socketio=None).latest(session_id="s1")
+    assert stored.keys() == published.keys()
+    assert {k: v for k, v in stored.items() if k != "updated_at"} == \
+           {k: v for k, v in published.items() if k != "updated_at"}
+    assert all(type(stored[field]) is bool for field in db.VERIFICATION_FIELDS)
+
+
+def test_latest_reads_the_database(pool):
+    hub = DashboardHub(socketio=None)
+    assert hub.latest() is None
+    db.save_verification("s1", {"human_voice": True}, agent_id="a1")
+    db.save_verification("s2", {"matching_voice": True}, agent_id="a2").result(5)
+
+    # Nothing cached yet, so another worker's write is read from the database
+    assert hub.latest()["session_id"] == "s2"
+    assert hub.latest(agent_id="a1")["session_id"] == "s1"
+    assert hub.latest(agent_id="a1")["human_voice"] is True
+
+
+def test_published_state_is_served_from_memory(pool, monkeypatch):
+    socketio = FakeSocketIO()
+    hub = DashboardHub(socketio)
+    queries = count_queries(monkeypatch)
+    monkeypatch.setattr(dashboard, "join_room", lambda room: None)  # no request context here
+    hub.publish({"session_id": "s1", "agent_id": "a1", "human_voice": True, "updated_at": 1.0})
+
+    assert hub.latest()["session_id"] == "s1"
+    assert hub.latest(agent_id="a1")["human_voice"] is True
+    hub.join("sid1", session_id="s1", agent_id="a1", admin=True)
+    assert queries == []
+    assert [to for _, _, to in socketio.emitted] == ["sid1"]
+
+
+def test_cache_miss_reads_the_database_once(pool, monkeypatch):
+    db.save_verification("s1", {"human_voice": True}, agent_id="a1").result(5)
+    hub = DashboardHub(FakeSocketIO())
+    queries = count_queries(monkeypatch)
+    monkeypatch.setattr(dashboard, "join_room", lambda room: None)
+
+    hub.join("sid1", agent_id="a1")
+    hub.join("sid2", agent_id="a1")
+    assert hub.latest(agent_id="a1")["session_id"] == "s1"
+    assert len(queries) == 1
+
+
+def test_other_workers_updates_are_cached_from_the_queue(pool, monkeypatch):
+    socketio = FakeSocketIO()
+    hub = DashboardHub(socketio)
+    queries = count_queries(monkeypatch)
+    newer = payload({"session_id": "s2", "agent_id": "a2", "updated_at": 2.0})
+    older = payload({"session_id": "s1", "agent_id": "a2", "updated_at": 1.0})
+    for state in (newer, older):
+        socketio.server.manager._handle_emit(
+            {"method": "emit", "event": "verification_update", "data": [state], "room": agent_room("a2")})
+    # A reply to a single client is not a room state
+    socketio.server.manager._handle_emit(
+        {"method": "emit", "event": "verification_update", "data": [older], "room": "sid1"})
+
+    assert len(socketio.server.manager.delivered) == 3
+    assert hub.latest(agent_id="a2")["session_id"] == "s2"
+    assert hub.metrics()["rooms_cached"] == 1
+    assert queries == []
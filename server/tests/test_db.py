@@ -0,0 +1,61 @@
+import sqlite3
+from contextlib import closing
+
+import db
+
+
+def legacy_database(path, rows):
+    # users.db as the original schema.sql created it, before migrations existed
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute("""
+            CREATE TABLE users (
+                first_name BOOLEAN DEFAULT 0, middle_initial BOOLEAN DEFAULT 0,
+                last_name BOOLEAN DEFAULT 0, last_four_digits BOOLEAN DEFAULT 0,
+                zip_code BOOLEAN DEFAULT 0, human_voice BOOLEAN DEFAULT 0,
+                matching_voice BOOLEAN DEFAULT 0, matching_face BOOLEAN DEFAULT 0
+            )""")
+        conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+
+
+def test_migrate_backfills_legacy_rows(tmp_path):
+    path = str(tmp_path / "users.db")
+    legacy_database(path, [(1, 1, 1, 1, 1, 1, 0, 1), (0, 0, 0, 0, 0, 0, 1, 0)])
+    with closing(db.connect(path)) as conn:
+        db.migrate(conn)
+        db.migrate(conn)  # a second run (another worker starting) is a no-op
+
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(db.MIGRATIONS)
+        sessions = [dict(row) for row in conn.execute("SELECT * FROM verification_sessions ORDER BY id")]
+        assert [s["session_id"] for s in sessions] == ["legacy-1", "legacy-2"]
+        assert [(s["human_voice"], s["matching_voice"], s["matching_face"]) for s in sessions] == [
+            (1, 0, 1), (0, 1, 0)]
+
+        aggregates = {row["check_name"]: (row["passed"], row["failed"]) for row in conn.execute(
+            "SELECT * FROM verification_aggregates WHERE hour = 0 AND agent_id = ''")}
+        assert aggregates == {"human_voice": (1, 1), "matching_voice": (1, 1), "matching_face": (1, 1)}
+        totals = {row["check_name"]: (row["passed"], row["failed"]) for row in conn.execute(
+            "SELECT * FROM verification_totals WHERE agent_id = ''")}
+        assert totals == aggregates
+        assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 2
+
+
+def test_migrate_fresh_database(tmp_path):
+    with closing(db.connect(str(tmp_path / "users.db"))) as conn:
+        db.migrate(conn)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert {"users", "verification_sessions", "verification_aggregates", "verification_totals"} <= tables
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_save_verification_upserts_by_session(pool):
+    db.save_verification("s1", {"human_voice": True}, user_id="u1", agent_id="a1")
+    db.save_verification("s1", {"human_voice": True, "matching_face": True})
+    db.save_verification("s2", {"matching_voice": True}, user_id="u2").result(5)
+
+    row = db.latest_verification(session_id="s1")
+    assert (row["user_id"], row["agent_id"], row["human_voice"], row["matching_face"]) == ("u1", "a1", 1, 1)
+    assert db.latest_verification(user_id="u2")["session_id"] == "s2"
+    assert db.latest_verification()["session_id"] == "s2"
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM verification_sessions").fetchone()[0] == 2
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from face_gallery import ENCODING_DIM, FaceGallery
+
+
+def encoding(seed):
+    return np.random.default_rng(seed).standard_normal(ENCODING_DIM) * 0.1
+
+
+def test_match_and_claimed_identity(tmp_path):
+    gallery = FaceGallery(str(tmp_path / "gallery"))
+    gallery.enroll_encoding("alice", encoding(0), "a")
+    gallery.enroll_encoding("bob", encoding(1), "b")
+
+    name, distance = gallery.match([encoding(1)])
+    assert name == "bob" and distance == pytest.approx(0.0, abs=1e-6)
+    name, distance = gallery.match([encoding(0) + 0.01], name="alice")
+    assert name == "alice" and distance < 0.2
+    assert gallery.match(np.zeros((0, ENCODING_DIM))) == (None, None)
+    with pytest.raises(KeyError):
+        gallery.match([encoding(0)], name="carol")
+
+
+def test_enrollments_from_other_processes_are_picked_up(tmp_path):
+    # Two instances on one directory stand in for two gunicorn workers
+    root = str(tmp_path / "gallery")
+    worker_a, worker_b = FaceGallery(root), FaceGallery(root)
+    worker_a.enroll_encoding("alice", encoding(0), "a")
+    version = worker_b.version
+    worker_b.enroll_encoding("bob", encoding(1), "b")
+
+    assert "alice" in worker_b and "bob" in worker_a
+    assert worker_a.version == worker_b.version != version
+    assert len(FaceGallery(root)) == 2
+
+
+def test_reenroll_replaces_row_and_growth_keeps_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr("face_gallery.INITIAL_CAPACITY", 2)
+    root = str(tmp_path / "gallery")
+    gallery, follower = FaceGallery(root), FaceGallery(root)
+    for i in range(5):
+        gallery.enroll_encoding(f"user{i}", encoding(i), str(i))
+    gallery.enroll_encoding("user0", encoding(10), "10")
+
+    assert len(follower) == 5
+    assert follower.match([encoding(10)])[0] == "user0"
+    assert follower.match([encoding(4)])[0] == "user4"
+    np.testing.assert_allclose(follower.encodings[0], encoding(10))
+    assert follower.hashes[0] == "10"
+
+
+def test_legacy_npz_is_imported(tmp_path):
+    root = str(tmp_path / "face_gallery")
+    np.savez(f"{root}.npz", names=np.array(["alice", "bob"]), hashes=np.array(["a", "b"]),
+             encodings=np.array([encoding(0), encoding(1)]))
+    gallery = FaceGallery(root)
+    assert gallery.names == ["alice", "bob"]
+    assert gallery.match([encoding(1)])[0] == "bob"
@@ -0,0 +1,59 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from voice_classification.forest import CompiledForest, check_parity, export_forest
+from voice_classification.voice_classifier import VoiceClassifier
+
+
+def fitted_forest(n_features=20, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((400, n_features)).astype(np.float32)
+    y = (X[:, 0] + 0.5 * X[:, 1] * X[:, 2] + 0.3 * rng.standard_normal(400) > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=25, max_depth=8, random_state=seed).fit(X, y)
+    return model, X, rng
+
+
+def test_compiled_predict_proba_matches_sklearn(tmp_path):
+    model, X, rng = fitted_forest()
+    compiled = export_forest(model, str(tmp_path / "forest.npz"))
+    probes = np.vstack([X[:50], rng.standard_normal((200, X.shape[1])).astype(np.float32)])
+
+    np.testing.assert_allclose(compiled.predict_proba(probes), model.predict_proba(probes), atol=1e-6)
+    np.testing.assert_array_equal(compiled.predict(probes), model.predict(probes))
+    assert check_parity(model, compiled, probes) <= 1e-6
+
+
+def test_round_trip_through_any_file_name(tmp_path):
+    model, X, _ = fitted_forest(seed=1)
+    path = str(tmp_path / "voice_classifier.npz.123.tmp")
+    export_forest(model, path)
+    assert os.listdir(tmp_path) == ["voice_classifier.npz.123.tmp"]
+    np.testing.assert_allclose(CompiledForest.load(path).predict_proba(X), model.predict_proba(X), atol=1e-6)
+
+
+def test_check_parity_raises_on_mismatch(tmp_path):
+    model, X, _ = fitted_forest(seed=2)
+    other, _, _ = fitted_forest(seed=3)
+    with pytest.raises(AssertionError):
+        check_parity(model, export_forest(other, str(tmp_path / "other.npz")), X)
+
+
+def test_classifier_ignores_compiled_forest_older_than_pickle(tmp_path):
+    model, X, _ = fitted_forest(seed=4)
+    paths = {name: str(tmp_path / name) for name in ("model.pkl", "scaler.pkl", "model.npz")}
+    export_forest(model, paths["model.npz"])
+    joblib.dump(model, paths["model.pkl"])
+    joblib.dump(StandardScaler().fit(X), paths["scaler.pkl"])
+    os.utime(paths["model.npz"], ns=(0, 0))
+
+    classifier = VoiceClassifier(paths["model.pkl"], paths["scaler.pkl"], compiled_path=paths["model.npz"])
+    assert classifier._active_model_path() == paths["model.pkl"]
+    assert isinstance(classifier.load()[1], RandomForestClassifier)
+
+    os.utime(paths["model.npz"])
+    assert classifier._active_model_path() == paths["model.npz"]
@@ -0,0 +1,63 @@
+from voice_classification.result_cache import ResultCache, bytes_hash
+
+
+def test_version_is_part_of_the_key():
+    cache = ResultCache("test", disk_dir=None)
+    cache.set_version("v1")
+    key = cache.key(bytes_hash(b"audio"), 0.4)
+    cache.put(key, 0.9)
+
+    cache.set_version("v2")
+    assert cache.key(bytes_hash(b"audio"), 0.4) != key
+    assert cache.key(bytes_hash(b"audio"), 0.5) != cache.key(bytes_hash(b"audio"), 0.4)
+
+
+def test_set_version_drops_old_results():
+    cache = ResultCache("test", disk_dir=None)
+    cache.set_version("v1")
+    key = cache.key("hash")
+    cache.put(key, 1)
+    cache.set_version("v1")  # unchanged version keeps results
+    assert cache.get(key) == (True, 1)
+
+    cache.set_version("v2")
+    assert cache.get(key) == (False, None)
+    assert cache.metrics()["invalidations"] == 1
+
+
+def test_lru_eviction():
+    cache = ResultCache("test", max_entries=2, disk_dir=None)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")  # now most recently used
+    cache.put("c", 3)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("c") == (True, 3)
+    assert cache.metrics()["evictions"] == 1
+
+
+def test_disk_tier_shared_between_instances(tmp_path):
+    first = ResultCache("test", disk_dir=str(tmp_path))
+    first.set_version("v1")
+    key = first.key("hash", 0.4)
+    first.put(key, {"score": 0.7})
+
+    # Another worker, or the same one after a restart
+    second = ResultCache("test", disk_dir=str(tmp_path))
+    second.set_version("v1")
+    assert second.get(key) == (True, {"score": 0.7})
+    assert second.get(key) == (True, {"score": 0.7})
+    assert (second.metrics()["disk_hits"], second.metrics()["memory_hits"]) == (1, 1)
+
+    # A newer model never reads the older one's files
+    second.set_version("v2")
+    assert second.get(second.key("hash", 0.4)) == (False, None)
+
+
+def test_unserializable_value_stays_in_memory(tmp_path):
+    cache = ResultCache("test", disk_dir=str(tmp_path))
+    cache.put("key", object())
+    assert cache.get("key")[0]
+    assert not list((tmp_path / "test").glob("*"))
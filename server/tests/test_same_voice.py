@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+import torch
+
+SAMPLE_RATE = 16000
+
+
+class StubRecognizer:
+    # Mean log spectrum of the unpadded part of each row, folded to 192 bins;
+    # like ECAPA, only wav_lens says where a row's padding starts
+    def encode_batch(self, wavs, wav_lens):
+        embeddings = []
+        for wav, relative in zip(wavs.numpy(), wav_lens.numpy()):
+            signal = wav[:int(round(float(relative) * wavs.shape[1]))]
+            frames = signal[:len(signal) // 400 * 400].reshape(-1, 400)
+            spectrum = np.log1p(np.abs(np.fft.rfft(frames, axis=1))).mean(axis=0)
+            embeddings.append(np.add.reduceat(spectrum, np.linspace(0, len(spectrum), 193, dtype=int)[:-1]))
+        return torch.from_numpy(np.array(embeddings, dtype=np.float32))[:, np.newaxis]
+
+
+@pytest.fixture
+def same_voice(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the module creates its speaker store in the working directory
+    import models
+    import same_voice
+    monkeypatch.setattr(models.registry, "get", lambda name: StubRecognizer())
+    return same_voice
+
+
+def test_batched_embeddings_match_single(same_voice):
+    rng = np.random.default_rng(0)
+    # Short signals padded to a long outlier get small relative lengths
+    signals = [rng.standard_normal(int(seconds * SAMPLE_RATE)).astype(np.float32)
+               for seconds in (0.3, 1.0, 2.7, 30.0)]
+    batched = same_voice.embed_signals(signals)
+    for signal, embedding in zip(signals, batched):
+        np.testing.assert_allclose(embedding, same_voice.embed_signals([signal])[0], atol=1e-4)
+
+
+def test_short_signals_are_rejected_before_batching(same_voice):
+    with pytest.raises(ValueError):
+        same_voice.embed_signal(np.zeros(0, dtype=np.float32))
+    with pytest.raises(ValueError):
+        same_voice.embed_signal(np.zeros(SAMPLE_RATE // 20, dtype=np.float32))
+    assert same_voice.embedding_scheduler.metrics()["items"] == 0
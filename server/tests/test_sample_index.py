@@ -0,0 +1,33 @@
+import numpy as np
+import soundfile as sf
+
+from voice_classification.sample_index import SampleIndex
+
+
+def write_samples(directory, names):
+    directory.mkdir(exist_ok=True)
+    rng = np.random.default_rng(0)
+    for name in names:
+        sf.write(str(directory / name), rng.standard_normal(8000).astype(np.float32) * 0.1, 16000)
+
+
+def test_get_serves_persisted_index_while_first_scan_runs(tmp_path):
+    samples, index_path = tmp_path / "samples", str(tmp_path / "index.npz")
+    write_samples(samples, ["a.wav", "b.wav"])
+    SampleIndex(str(samples), index_path=index_path).refresh()
+
+    index = SampleIndex(str(samples), index_path=index_path, poll_interval=3600)
+    with index._refresh_lock:  # the background scan can't finish
+        entry = index.get("a.wav")
+    assert entry is not None and entry["mfcc"].shape[0] > 0
+    assert index._thread is not None
+
+
+def test_get_waits_for_scan_for_unknown_names(tmp_path):
+    samples = tmp_path / "samples"
+    write_samples(samples, ["a.wav"])
+    index = SampleIndex(str(samples), index_path=None, poll_interval=3600)
+
+    assert index.get("a.wav") is not None
+    assert index.get("missing.wav") is None
+    assert index.names() == ["a.wav"]
@@ -0,0 +1,95 @@
+import multiprocessing
+
+import numpy as np
+
+from speaker_store import EMBEDDING_DIM, SpeakerStore, normalize
+
+
+def samples(n, seed):
+    return np.random.default_rng(seed).standard_normal((n, EMBEDDING_DIM)).astype(np.float32)
+
+
+def test_reenrollment_weighs_every_sample_equally(tmp_path):
+    first, second = samples(3, 0), samples(1, 1)
+    store = SpeakerStore(str(tmp_path))
+    store.enroll("alice", first)
+    assert store.enroll("alice", second) == 4
+
+    expected = normalize(normalize(np.vstack([first, second])).sum(axis=0))
+    np.testing.assert_allclose(store.embedding("alice"), expected, atol=1e-6)
+
+
+def test_incremental_enrollment_matches_one_shot(tmp_path):
+    embeddings = samples(6, 2)
+    incremental = SpeakerStore(str(tmp_path / "incremental"))
+    for embedding in embeddings:
+        incremental.enroll("bob", embedding)
+    one_shot = SpeakerStore(str(tmp_path / "one_shot"))
+    one_shot.enroll("bob", embeddings)
+
+    np.testing.assert_allclose(incremental.embedding("bob"), one_shot.embedding("bob"), atol=1e-6)
+
+
+def test_replace_and_reload(tmp_path):
+    store = SpeakerStore(str(tmp_path))
+    store.enroll("carol", samples(2, 3))
+    replacement = samples(1, 4)
+    assert store.enroll("carol", replacement, replace=True) == 1
+
+    reopened = SpeakerStore(str(tmp_path))
+    assert reopened.counts[reopened.rows["carol"]] == 1
+    np.testing.assert_allclose(reopened.embedding("carol"), normalize(replacement)[0], atol=1e-6)
+    # Sums survive a reload, so later enrollments still accumulate correctly
+    extra = samples(1, 5)
+    reopened.enroll("carol", extra)
+    expected = normalize(normalize(np.vstack([replacement, extra])).sum(axis=0))
+    np.testing.assert_allclose(reopened.embedding("carol"), expected, atol=1e-6)
+
+
+def test_grow_keeps_rows_and_sums(tmp_path, monkeypatch):
+    monkeypatch.setattr("speaker_store.INITIAL_CAPACITY", 2)
+    store = SpeakerStore(str(tmp_path))
+    embeddings = samples(5, 6)
+    store.enroll_many((f"user{i}", embeddings[i]) for i in range(5))
+    store.enroll("user0", embeddings[1])
+
+    assert store.matrix().shape == (5, EMBEDDING_DIM)
+    expected = normalize(normalize(embeddings[:2]).sum(axis=0))
+    np.testing.assert_allclose(store.embedding("user0"), expected, atol=1e-6)
+    assert store.search(embeddings[3], k=1)[0][0] == "user3"
+
+
+def test_workers_see_each_others_enrollments(tmp_path, monkeypatch):
+    monkeypatch.setattr("speaker_store.INITIAL_CAPACITY", 2)
+    first, second = SpeakerStore(str(tmp_path)), SpeakerStore(str(tmp_path))
+    embeddings = samples(4, 7)
+    first.enroll("dave", embeddings[0])
+    second.enroll("erin", embeddings[1])  # must not reuse dave's row
+    first.enroll_many([("frank", embeddings[2]), ("grace", embeddings[3])])  # grows the files
+
+    for store in (first, second):
+        assert len(store) == 4 and "grace" in store
+        for i, user_id in enumerate(["dave", "erin", "frank", "grace"]):
+            np.testing.assert_allclose(store.embedding(user_id), normalize(embeddings[i]), atol=1e-6)
+    assert second.search(embeddings[2], k=1)[0][0] == "frank"
+
+
+def _enroll_range(root, prefix, n):
+    store = SpeakerStore(root)
+    for i in range(n):
+        store.enroll(f"{prefix}{i}", samples(1, i)[0])
+
+
+def test_concurrent_processes_get_distinct_rows(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_enroll_range, args=(str(tmp_path), prefix, 40)) for prefix in "ab"]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    store = SpeakerStore(str(tmp_path))
+    assert len(store) == 80 and sorted(store.rows.values()) == list(range(80))
+    for prefix in "ab":
+        np.testing.assert_allclose(store.embedding(f"{prefix}7"), normalize(samples(1, 7))[0], atol=1e-6)
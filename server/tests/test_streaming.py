@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+import pytest
+
+from voice_classification.audio_io import load_audio
+from voice_classification.features import HOP_LENGTH, N_FFT, AudioFeatures, MAX_LEN
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The stream computes frames without centre padding: its frame k is offline frame k + 2
+CENTER_OFFSET = N_FFT // 2 // HOP_LENGTH
+
+
+@pytest.fixture
+def streaming(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # same_voice creates its speaker store in the working directory
+    import streaming
+    return streaming
+
+
+@pytest.mark.parametrize("sample", ["pragyam_sample.wav", "Tarun.wav"])
+@pytest.mark.parametrize("chunk", [1000, 4096, 16000])
+def test_window_matches_offline_mfcc(streaming, sample, chunk):
+    audio, sr = load_audio(os.path.join(SERVER_DIR, sample))
+    stream = streaming.DeepfakeStream(sr, score_interval=1e9)  # never scores
+    for start in range(0, len(audio), chunk):
+        stream.push(audio[start:start + chunk])
+
+    frames = 1 + (len(audio) - N_FFT) // HOP_LENGTH
+    kept = min(frames, MAX_LEN)
+    offline = AudioFeatures(audio, sr).mfcc[:, frames - kept + CENTER_OFFSET:frames + CENTER_OFFSET]
+    window = stream.window()
+    np.testing.assert_allclose(window[:, :kept], offline, atol=1e-3)
+    assert not window[:, kept:].any()  # zero-padded like training
@@ -0,0 +1,136 @@
+import os
+import struct
+import subprocess
+import tempfile
+
+import numpy as np
+import soxr
+
+TARGET_SR = 16000
+FFMPEG = "ffmpeg"
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def is_wav(data):
+    return len(data) >= 12 and data[:4] in (b"RIFF", b"RF64") and data[8:12] == b"WAVE"
+
+
+def _parse_wav(data):
+    # Returns ((format_tag, channels, sample_rate, bits), sample_bytes).
+    # Chunk sizes of 0 / 0xFFFFFFFF (streamed WAV, e.g. ffmpeg writing to a
+    # pipe) are treated as "until the end of the buffer".
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        size = int.from_bytes(data[pos + 4:pos + 8], "little")
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            tag, channels, sr, _, _, bits = struct.unpack_from("<HHIIHH", data, body)
+            if tag == WAVE_FORMAT_EXTENSIBLE:
+                tag = struct.unpack_from("<H", data, body + 24)[0]
+            fmt = (tag, channels, sr, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            end = len(data) if size in (0, 0xFFFFFFFF) else min(body + size, len(data))
+            frame_bytes = fmt[1] * fmt[3] // 8
+            end -= (end - body) % frame_bytes
+            return fmt, data[body:end]
+        pos = body + size + (size & 1)
+    raise ValueError("WAV file has no data chunk")
+
+
+def _samples_to_float(raw, tag, bits):
+    if tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        return np.frombuffer(raw, dtype=f"<f{bits // 8}").astype(np.float32)
+    if tag != WAVE_FORMAT_PCM:
+        raise ValueError(f"Unsupported WAV format tag {tag}")
+    if bits == 8:
+        return (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    if bits == 16:
+        return np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    if bits == 24:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        ints = (ints << 8) >> 8  # sign-extend
+        return ints.astype(np.float32) / 8388608
+    if bits == 32:
+        return np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648
+    raise ValueError(f"Unsupported WAV bit depth {bits}")
+
+
+def decode_wav(data):
+    (tag, channels, sr, bits), raw = _parse_wav(data)
+    audio = _samples_to_float(raw, tag, bits)
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    return audio, sr
+
+
+def is_mp4(data):
+    # ISO base media (m4a, mp4, 3gp, mov): starts with a size then "ftyp"
+    return len(data) >= 12 and data[4:8] == b"ftyp"
+
+
+def _run_ffmpeg(source, data=None):
+    return subprocess.run(
+        [FFMPEG, "-nostdin", "-loglevel", "error", "-i", source,
+         "-ac", "1", "-f", "wav", "-acodec", "pcm_f32le", "pipe:1"],
+        input=data, capture_output=True,
+    )
+
+
+def decode_with_ffmpeg(data):
+    # Compressed formats (webm/opus from MediaRecorder, mp3, m4a, ...) only.
+    # ffmpeg writes a float WAV to stdout so the native rate is kept.
+    if is_mp4(data):
+        # The moov atom is often at the end of the file and ffmpeg has to
+        # seek to it, which a pipe cannot do
+        fd, path = tempfile.mkstemp(suffix=".m4a")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            proc = _run_ffmpeg(path)
+        finally:
+            os.remove(path)
+    else:
+        proc = _run_ffmpeg("pipe:0", data)
+    if proc.returncode != 0:
+        raise ValueError(f"ffmpeg could not decode audio: {proc.stderr.decode(errors='replace').strip()}")
+    return decode_wav(proc.stdout)
+
+
+def resample(audio, orig_sr, target_sr):
+    if orig_sr == target_sr:
+        return audio
+    return soxr.resample(audio, orig_sr, target_sr).astype(np.float32)
+
+
+def decode_audio(data, sr=TARGET_SR):
+    """
+    Decode audio bytes into a mono float32 buffer in memory.
+    WAV/PCM is parsed directly; other formats go through an ffmpeg pipe.
+    Resamples to sr, or keeps the native rate when sr is None.
+    Returns (audio, sample_rate).
+    """
+    if is_wav(data):
+        audio, native_sr = decode_wav(data)
+    else:
+        audio, native_sr = decode_with_ffmpeg(data)
+    if sr is None:
+        return audio, native_sr
+    return resample(audio, native_sr, sr), sr
+
+
+def load_audio(path, sr=TARGET_SR):
+    with open(path, "rb") as f:
+        return decode_audio(f.read(), sr)
+
+
+def pcm16_to_float(data):
+    # Raw little-endian int16 PCM, e.g. chunks streamed from the browser
+    return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768
@@ -0,0 +1,199 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .audio_io import load_audio
+from .vad import trim_silence
+from . import voice_classifier
+
+# Run from server/ with:
+#   python -m voice_classification.batch_classify <dir|glob|manifest> -o results.jsonl
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg', '.m4a', '.webm')
+MANIFEST_EXTENSIONS = ('.txt', '.csv', '.jsonl')
+BATCH_SIZE = 64
+FIELDS = ['path', 'label', 'ai_probability', 'threshold', 'error']
+
+
+def resolve_inputs(source):
+    """
+    Audio paths from a directory (recursive), a manifest file (.txt with one
+    path per line, .csv with a 'path' column, or .jsonl with a 'path' key;
+    relative paths are resolved against the manifest) or a glob pattern.
+    """
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(AUDIO_EXTENSIONS))
+        return sorted(paths)
+
+    if os.path.isfile(source) and source.lower().endswith(MANIFEST_EXTENSIONS):
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source, newline='') as f:
+            if source.lower().endswith('.csv'):
+                entries = [row['path'] for row in csv.DictReader(f)]
+            elif source.lower().endswith('.jsonl'):
+                entries = [json.loads(line)['path'] for line in f if line.strip()]
+            else:
+                entries = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        return [os.path.join(base, entry) for entry in entries]
+
+    if os.path.isfile(source):
+        return [source]
+    return sorted(glob.glob(source, recursive=True))
+
+
+def _extract(path):
+    # Worker process: decode + MFCC for one file
+    try:
+        audio, sr = load_audio(path, sr=None)
+        if voice_classifier.USE_VAD:
+            audio, _ = trim_silence(audio, sr)
+        return path, voice_classifier.mfcc_features(audio, sr), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def _completed_paths(output):
+    """
+    Paths already classified successfully in output. Rows that ended in an
+    error are not counted, so a resumed run retries them (the new row is
+    appended after the old one). A partially written last line (crash
+    mid-write) is cut off so appended results start on a fresh line.
+    """
+    if not os.path.exists(output):
+        return set()
+    with open(output, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end != len(data):
+            f.truncate(end)
+    text = data[:end].decode()
+
+    if output.endswith('.csv'):
+        rows = csv.DictReader(text.splitlines())
+    else:
+        rows = []
+        for line in text.splitlines():
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                continue
+    # CSV writes a missing label or error as an empty string, JSON as null
+    return {row['path'] for row in rows if row.get('path') and row.get('label') and not row.get('error')}
+
+
+class ResultWriter:
+    def __init__(self, output):
+        self.is_csv = output.endswith('.csv')
+        write_header = self.is_csv and (not os.path.exists(output) or os.path.getsize(output) == 0)
+        self.file = open(output, 'a', newline='')
+        if self.is_csv:
+            self.writer = csv.DictWriter(self.file, fieldnames=FIELDS)
+            if write_header:
+                self.writer.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            if self.is_csv:
+                self.writer.writerow(row)
+            else:
+                self.file.write(json.dumps(row) + '\n')
+        # Flushed per batch so a crash loses at most the batch in flight
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+def _score(pending, threshold):
+    paths = [path for path, _ in pending]
+    probabilities = voice_classifier.classifier.predict_proba(np.stack([f for _, f in pending]))
+    return [
+        {
+            'path': path,
+            'label': "AI" if p >= threshold else "Human",
+            'ai_probability': round(float(p), 6),
+            'threshold': threshold,
+            'error': None,
+        }
+        for path, p in zip(paths, probabilities)
+    ]
+
+
+def classify_batch(source, output, workers=None, batch_size=BATCH_SIZE, threshold=None, resume=True):
+    """
+    Classify every file in source and stream one row per file to output
+    (.jsonl or .csv). Features are extracted in a process pool and scored
+    batch_size rows at a time with one scaler/model call. With resume=True
+    files already classified in output are skipped and failed ones are
+    retried. Returns a summary dict.
+    """
+    threshold = voice_classifier.classifier.threshold if threshold is None else threshold
+    paths = resolve_inputs(source)
+    done = _completed_paths(output) if resume else set()
+    if not resume and os.path.exists(output):
+        os.remove(output)
+    todo = [path for path in paths if path not in done]
+    print(f"{len(paths)} files, {len(paths) - len(todo)} already done, {len(todo)} to classify")
+
+    start = time.perf_counter()
+    counts = {'Human': 0, 'AI': 0, 'error': 0}
+    writer = ResultWriter(output)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            # Submit in windows so finished-but-unwritten features stay bounded
+            window = batch_size * (workers or os.cpu_count() or 1) * 4
+            for offset in range(0, len(todo), window):
+                chunk = todo[offset:offset + window]
+                for path, features, error in pool.map(_extract, chunk, chunksize=4):
+                    if features is None:
+                        writer.write([{'path': path, 'label': None, 'ai_probability': None,
+                                       'threshold': threshold, 'error': error}])
+                        counts['error'] += 1
+                        continue
+                    pending.append((path, features))
+                    if len(pending) >= batch_size:
+                        rows = _score(pending, threshold)
+                        writer.write(rows)
+                        for row in rows:
+                            counts[row['label']] += 1
+                        pending = []
+            if pending:
+                rows = _score(pending, threshold)
+                writer.write(rows)
+                for row in rows:
+                    counts[row['label']] += 1
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    summary = dict(counts, total=len(paths), skipped=len(paths) - len(todo), seconds=round(elapsed, 2),
+                   files_per_second=round(len(todo) / elapsed, 2) if elapsed else 0.0)
+    print(json.dumps(summary))
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk deepfake classification of recorded calls")
+    parser.add_argument('source', help="directory, glob pattern or manifest (.txt/.csv/.jsonl)")
+    parser.add_argument('-o', '--output', default='results.jsonl', help=".jsonl or .csv results file")
+    parser.add_argument('--workers', type=int, default=None, help="feature extraction processes")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--threshold', type=float, default=None)
+    parser.add_argument('--no-resume', action='store_true', help="start over instead of skipping done files")
+    args = parser.parse_args(argv)
+    classify_batch(args.source, args.output, workers=args.workers, batch_size=args.batch_size,
+                   threshold=args.threshold, resume=not args.no_resume)
+
+
+if __name__ == "__main__":
+    main()
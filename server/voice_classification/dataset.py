@@ -0,0 +1,83 @@
+import json
+import os
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from tqdm import tqdm
+
+from .feature_cache import extract_all
+
+DATASET_DIR = "datasets"
+CHUNK_ROWS = 2048  # rows per chunk for scaler fitting, transforms and prediction
+
+
+def _paths(name, root=DATASET_DIR):
+    base = os.path.join(root, name)
+    return f"{base}.X.npy", f"{base}.y.npy", f"{base}.json"
+
+
+def build_dataset(name, paths, labels, extract_fn, feature_shape, cache=None, workers=None,
+                  root=DATASET_DIR, desc=None):
+    """
+    Extract features for paths straight into a memory-mapped float32 matrix.
+
+    The matrix is preallocated with one flattened row per file and filled as
+    results arrive, so peak memory does not grow with the dataset; files
+    that fail extraction are skipped and the row count recorded alongside.
+    """
+    os.makedirs(root, exist_ok=True)
+    x_path, y_path, meta_path = _paths(name, root)
+    n_features = int(np.prod(feature_shape))
+
+    X = np.lib.format.open_memmap(x_path, mode="w+", dtype=np.float32, shape=(len(paths), n_features))
+    y = np.empty(len(paths), dtype=np.int64)
+    rows = 0
+    results = extract_all(paths, extract_fn, cache=cache, workers=workers)
+    for (_, features), label in tqdm(zip(results, labels), total=len(paths), desc=desc):
+        if features is None:
+            continue
+        X[rows] = np.asarray(features, dtype=np.float32).ravel()
+        y[rows] = label
+        rows += 1
+    X.flush()
+    del X
+
+    np.save(y_path, y[:rows])
+    with open(meta_path, "w") as f:
+        json.dump({"rows": rows, "feature_shape": list(feature_shape)}, f)
+    return load_dataset(name, root)
+
+
+def load_dataset(name, root=DATASET_DIR):
+    # Returns (X, y) with X a read-only memory map of the valid rows
+    x_path, y_path, meta_path = _paths(name, root)
+    with open(meta_path) as f:
+        rows = json.load(f)["rows"]
+    X = np.load(x_path, mmap_mode="r")[:rows]
+    return X, np.load(y_path)
+
+
+def fit_scaler(X, chunk_rows=CHUNK_ROWS):
+    # Streaming fit: identical statistics to fit() without loading X at once
+    scaler = StandardScaler()
+    for start in range(0, len(X), chunk_rows):
+        scaler.partial_fit(X[start:start + chunk_rows])
+    return scaler
+
+
+def transform_to_memmap(X, scaler, path, chunk_rows=CHUNK_ROWS):
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=X.shape)
+    for start in range(0, len(X), chunk_rows):
+        out[start:start + chunk_rows] = scaler.transform(X[start:start + chunk_rows])
+    out.flush()
+    del out
+    return np.load(path, mmap_mode="r")
+
+
+def predict_proba_chunked(model, X, chunk_rows=CHUNK_ROWS):
+    if len(X) == 0:
+        return np.zeros((0, len(model.classes_)))
+    return np.concatenate([
+        model.predict_proba(X[start:start + chunk_rows])
+        for start in range(0, len(X), chunk_rows)
+    ])
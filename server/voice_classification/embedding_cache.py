@@ -0,0 +1,49 @@
+import os
+import threading
+
+import numpy as np
+
+from .feature_cache import content_hash
+
+EMBEDDING_CACHE_DIR = "embedding_cache"
+
+
+class ReferenceEmbedding:
+    """
+    Embedding of a reference audio file, computed once per file content and
+    variant (e.g. with or without VAD) and stored on disk under cache_dir, so
+    restarts and other workers reuse it as well.
+
+    The last result is also kept in memory, keyed by the file's stat, so a
+    replaced reference file is picked up without rehashing it on every call.
+    """
+
+    def __init__(self, embed_fn, variant, cache_dir=EMBEDDING_CACHE_DIR):
+        self.embed_fn = embed_fn
+        self.variant = variant
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._latest = (None, None, None)  # path, stat, embedding
+
+    def get(self, path):
+        st = os.stat(path)
+        stat_key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached_path, cached_stat, embedding = self._latest
+        if cached_path == path and cached_stat == stat_key:
+            return embedding
+
+        cache_path = os.path.join(self.cache_dir, f"{content_hash(path)}_{self.variant}.npy")
+        if os.path.exists(cache_path):
+            embedding = np.load(cache_path)
+        else:
+            embedding = np.asarray(self.embed_fn(path), dtype=np.float32)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, embedding)
+            os.replace(tmp_path, cache_path)
+
+        with self._lock:
+            self._latest = (path, stat_key, embedding)
+        return embedding
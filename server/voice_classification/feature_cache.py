@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+CACHE_DIR = "feature_cache"
+INITIAL_CAPACITY = 1024
+FAILED = -1  # index value older versions persisted for failed files
+
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """
+    Extracted features keyed by file content hash and extraction settings.
+
+    All entries of one cache share a shape and are rows of a single
+    memory-mapped float32 .npy array; index.json maps each key to its row.
+    A renamed file is still a hit, an edited file is a miss, and changing
+    the extraction settings (the namespace) starts a separate array.
+    Failed extractions are only remembered for the lifetime of the object,
+    never on disk, so a transient error is retried on the next run.
+    """
+
+    def __init__(self, shape, namespace="features", root=CACHE_DIR):
+        self.shape = tuple(shape)
+        self.root = root
+        self.matrix_path = os.path.join(root, f"{namespace}.npy")
+        self.index_path = os.path.join(root, f"{namespace}.index.json")
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+        self.index = {}
+        self.failed = set()
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = {key: row for key, row in json.load(f).items() if row != FAILED}
+        self.rows = max(self.index.values(), default=-1) + 1
+        if os.path.exists(self.matrix_path):
+            self._matrix = np.load(self.matrix_path, mmap_mode="r+")
+        else:
+            self._matrix = self._allocate(self.matrix_path, INITIAL_CAPACITY)
+
+    def _allocate(self, path, capacity):
+        return np.lib.format.open_memmap(
+            path, mode="w+", dtype=np.float32, shape=(capacity,) + self.shape
+        )
+
+    def _grow(self, needed):
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        tmp_path = f"{self.matrix_path}.{os.getpid()}.tmp"
+        grown = self._allocate(tmp_path, capacity)
+        grown[:self.rows] = self._matrix[:self.rows]
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self.matrix_path)
+        self._matrix = np.load(self.matrix_path, mmap_mode="r+")
+
+    def __contains__(self, key):
+        return key in self.index or key in self.failed
+
+    def get(self, key):
+        # Returns (hit, features); features is None for a failure seen in this run
+        if key in self.failed:
+            return True, None
+        row = self.index.get(key)
+        if row is None:
+            return False, None
+        return True, np.array(self._matrix[row])
+
+    def put(self, key, features):
+        with self._lock:
+            if features is None:
+                self.failed.add(key)
+                return
+            self._grow(self.rows + 1)
+            self._matrix[self.rows] = features
+            self.index[key] = self.rows
+            self.rows += 1
+
+    def flush(self):
+        with self._lock:
+            self._matrix.flush()
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.index, f)
+            os.replace(tmp_path, self.index_path)
+
+
+def extract_all(paths, extract_fn, cache=None, workers=None, chunksize=4, flush_every=500):
+    """
+    Yield (path, features) for every path, in input order.
+
+    Files are hashed and, on a cache miss, passed to extract_fn in a process
+    pool; extract_fn must be a picklable top-level function returning an
+    array (or None on failure). Results are written back to the cache, so a
+    re-run only extracts new or changed files.
+    """
+    paths = list(paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if cache is None:
+            for path, features in zip(paths, pool.map(extract_fn, paths, chunksize=chunksize)):
+                yield path, features
+            return
+
+        keys = list(pool.map(content_hash, paths, chunksize=chunksize))
+        # One extraction per distinct uncached content, in first-seen order
+        misses, pending = [], set()
+        for path, key in zip(paths, keys):
+            if key not in cache and key not in pending:
+                pending.add(key)
+                misses.append(path)
+        extracted = pool.map(extract_fn, misses, chunksize=chunksize)
+
+        written = 0
+        try:
+            for path, key in zip(paths, keys):
+                hit, features = cache.get(key)
+                if not hit:
+                    features = next(extracted)
+                    cache.put(key, features)
+                    written += 1
+                    if written % flush_every == 0:
+                        cache.flush()
+                yield path, features
+        finally:
+            cache.flush()
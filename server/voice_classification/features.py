@@ -0,0 +1,77 @@
+from functools import cached_property
+
+import numpy as np
+
+from .audio_io import decode_audio, load_audio
+
+# librosa defaults, which every model in the repo was trained with
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+N_MFCC = 40
+MAX_LEN = 130
+
+# librosa (and numba behind it) takes seconds to import, so it is imported on
+# first use inside the properties below rather than when this module loads.
+
+
+def fix_length(frames, max_len=MAX_LEN):
+    # Zero-pad or truncate a (n, frames) feature matrix along time
+    if frames.shape[1] < max_len:
+        pad_width = max_len - frames.shape[1]
+        return np.pad(frames, pad_width=((0, 0), (0, pad_width)), mode='constant')
+    return frames[:, :max_len]
+
+
+class AudioFeatures:
+    """
+    Features of one decoded signal, computed on first use and memoized.
+
+    A single STFT power spectrogram feeds the mel spectrogram, which in turn
+    feeds both the MFCCs (deepfake classifier) and the mean mel-dB vector
+    (background sound classifier). Results are identical to calling
+    librosa.feature.mfcc / melspectrogram on the signal separately, but a
+    request that needs several of them decodes and transforms the audio once.
+    """
+
+    def __init__(self, audio, sr):
+        self.audio = audio
+        self.sr = sr
+
+    @classmethod
+    def from_file(cls, path, sr=None):
+        return cls(*load_audio(path, sr=sr))
+
+    @classmethod
+    def from_bytes(cls, data, sr=None):
+        return cls(*decode_audio(data, sr=sr))
+
+    @cached_property
+    def power(self):
+        import librosa
+        return np.abs(librosa.stft(self.audio, n_fft=N_FFT, hop_length=HOP_LENGTH)) ** 2
+
+    @cached_property
+    def mel(self):
+        import librosa
+        return librosa.feature.melspectrogram(S=self.power, sr=self.sr, n_mels=N_MELS)
+
+    @cached_property
+    def log_mel(self):
+        import librosa
+        # Same scaling librosa.feature.mfcc applies internally
+        return librosa.power_to_db(self.mel)
+
+    @cached_property
+    def mfcc(self):
+        import librosa
+        return librosa.feature.mfcc(S=self.log_mel, n_mfcc=N_MFCC)
+
+    def mfcc_fixed(self, max_len=MAX_LEN):
+        return fix_length(self.mfcc, max_len)
+
+    @cached_property
+    def mel_db_mean(self):
+        import librosa
+        mel_db = librosa.power_to_db(self.mel, ref=np.max)
+        return np.mean(mel_db, axis=1)
@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+
+# Next to the pickle that VoiceClassifier and train.py use
+COMPILED_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "voice_classifier.npz")
+
+
+def export_forest(model, path=COMPILED_MODEL_PATH):
+    """
+    Flatten a fitted RandomForestClassifier into packed NumPy arrays.
+
+    All trees are concatenated into one node table (feature, threshold,
+    left, right, class probabilities) with per-tree root offsets. Leaves
+    point to themselves, so every row can take the same number of steps.
+    """
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        nodes = np.arange(tree.node_count)
+        leaf = tree.children_left == -1
+        features.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append((np.where(leaf, nodes, tree.children_left) + offset).astype(np.int32))
+        rights.append((np.where(leaf, nodes, tree.children_right) + offset).astype(np.int32))
+        value = tree.value[:, 0, :]
+        totals = value.sum(axis=1, keepdims=True)
+        values.append((value / np.where(totals == 0, 1, totals)).astype(np.float32))
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    # Through a file object, so numpy doesn't append .npz to temporary names
+    with open(path, "wb") as f:
+        np.savez_compressed(
+            f,
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=np.int32(max_depth),
+            classes=model.classes_,
+            n_features=np.int32(model.n_features_in_),
+        )
+    return CompiledForest.load(path)
+
+
+class CompiledForest:
+    """
+    Vectorized evaluator for a forest exported with export_forest().
+    Scores a batch of rows over all trees at once: each step advances every
+    (row, tree) pair one level down, for max_depth steps.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, classes, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        self.n_features_in_ = int(n_features)
+
+    @classmethod
+    def load(cls, path=COMPILED_MODEL_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(**{name: data[name] for name in data.files})
+
+    def apply(self, X):
+        # Leaf index per (row, tree); X is compared as float32 like sklearn does
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, np.newaxis]
+        node = np.repeat(self.roots[np.newaxis], len(X), axis=0)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict_proba(self, X):
+        return self.value[self.apply(X)].mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def check_parity(model, compiled, X, atol=1e-6, chunk_rows=1024):
+    """
+    Raise AssertionError unless compiled probabilities match sklearn's on X.
+    Returns the largest absolute difference seen.
+    """
+    max_diff = 0.0
+    for start in range(0, len(X), chunk_rows):
+        chunk = np.asarray(X[start:start + chunk_rows])
+        diff = np.abs(model.predict_proba(chunk) - compiled.predict_proba(chunk)).max()
+        max_diff = max(max_diff, float(diff))
+    if max_diff > atol:
+        raise AssertionError(f"Compiled forest differs from sklearn by {max_diff:.2e} (atol {atol:.0e})")
+    return max_diff
@@ -0,0 +1,124 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+
+MAX_ENTRIES = 4096
+# Set RESULT_CACHE_DIR to also keep results on disk, shared by restarts and workers
+DISK_DIR = os.environ.get("RESULT_CACHE_DIR")
+
+
+def bytes_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResultCache:
+    """
+    Results of a model keyed by (content hash, model version, threshold).
+
+    A bounded LRU in memory, optionally backed by one JSON file per entry
+    under disk_dir so restarts and other workers share results. The model
+    version is part of every key, and set_version() drops the memory tier
+    when it changes, so a reloaded model never serves its predecessor's
+    results. Values must be JSON-serializable when disk_dir is used.
+    """
+
+    def __init__(self, name, max_entries=MAX_ENTRIES, disk_dir=DISK_DIR):
+        self.name = name
+        self.max_entries = max_entries
+        self.disk_dir = os.path.join(disk_dir, name) if disk_dir else None
+        self.version = None
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = collections.Counter()
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def set_version(self, version):
+        version = str(version)
+        with self._lock:
+            if version != self.version:
+                if self.version is not None:
+                    self._entries.clear()
+                    self._counts["invalidations"] += 1
+                self.version = version
+
+    def key(self, content_hash, threshold=None, *extra):
+        return "|".join(str(part) for part in (content_hash, self.version, threshold, *extra))
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{hashlib.sha256(key.encode()).hexdigest()}.json")
+
+    def get(self, key):
+        # Returns (hit, value)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._counts["hits"] += 1
+                self._counts["memory_hits"] += 1
+                return True, self._entries[key]
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key)) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = None
+            if entry is not None and entry.get("key") == key:
+                self._remember(key, entry["value"])
+                with self._lock:
+                    self._counts["hits"] += 1
+                    self._counts["disk_hits"] += 1
+                return True, entry["value"]
+
+        with self._lock:
+            self._counts["misses"] += 1
+        return False, None
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counts["evictions"] += 1
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump({"key": key, "value": value}, f)
+                os.replace(tmp_path, path)
+            except (OSError, TypeError) as e:
+                print(f"Could not write {self.name} result cache entry: {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def get_or_compute(self, key, compute):
+        hit, value = self.get(key)
+        if hit:
+            return value
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counts["invalidations"] += 1
+
+    def metrics(self):
+        with self._lock:
+            lookups = self._counts["hits"] + self._counts["misses"]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "version": self.version,
+                "hit_rate": self._counts["hits"] / lookups if lookups else 0.0,
+                **{name: self._counts[name] for name in
+                   ("hits", "misses", "memory_hits", "disk_hits", "evictions", "invalidations")},
+            }
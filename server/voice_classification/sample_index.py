@@ -0,0 +1,231 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from .batch_classify import AUDIO_EXTENSIONS
+from .feature_cache import content_hash
+from .features import MAX_LEN, N_MELS, N_MFCC, AudioFeatures
+
+# Run from server/ to build an index or check features against a snapshot:
+#   python -m voice_classification.sample_index ../static/samples --index snapshot.npz
+#   python -m voice_classification.sample_index ../static/samples --check snapshot.npz
+
+INDEX_PATH = "sample_index.npz"
+POLL_INTERVAL = 5.0  # seconds between directory scans
+EMBEDDING_DIM = 192
+
+
+class SampleIndex:
+    """
+    Features of every audio file in a directory that rarely changes (demo
+    and regression samples), computed once and persisted to index_path.
+
+    Each entry holds the file's content hash, its mean mel-dB vector (sound
+    classifier input), its fixed-size MFCC (deepfake classifier input) and,
+    when embed_fn is given, its speaker embedding. refresh() rescans the
+    directory and only recomputes files whose size or mtime changed, and
+    only when their content did; watch() does so periodically in a
+    background thread.
+    """
+
+    def __init__(self, directory, index_path=INDEX_PATH, embed_fn=None, poll_interval=POLL_INTERVAL):
+        self.directory = directory
+        self.index_path = index_path
+        self.embed_fn = embed_fn
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._entries = {}
+        self._scanned = False
+        self._thread = None
+        self._pid = None
+        if index_path and os.path.exists(index_path):
+            self._entries = self._load(index_path)
+
+    @staticmethod
+    def _load(path):
+        entries = {}
+        with np.load(path, allow_pickle=False) as data:
+            has_embeddings = len(data["embeddings"]) == len(data["names"])
+            for i, name in enumerate(data["names"].tolist()):
+                entries[name] = {
+                    "signature": (int(data["mtimes"][i]), int(data["sizes"][i])),
+                    "hash": str(data["hashes"][i]),
+                    "mel": data["mel"][i],
+                    "mfcc": data["mfcc"][i],
+                    "embedding": data["embeddings"][i] if has_embeddings else None,
+                }
+        return entries
+
+    def save(self, path=None):
+        path = path or self.index_path
+        with self._lock:
+            names = sorted(self._entries)
+            entries = [self._entries[name] for name in names]
+        embeddings = [entry["embedding"] for entry in entries]
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                names=np.array(names, dtype=str),
+                mtimes=np.array([entry["signature"][0] for entry in entries], dtype=np.int64),
+                sizes=np.array([entry["signature"][1] for entry in entries], dtype=np.int64),
+                hashes=np.array([entry["hash"] for entry in entries], dtype=str),
+                mel=np.array([entry["mel"] for entry in entries], dtype=np.float32).reshape(-1, N_MELS),
+                mfcc=np.array([entry["mfcc"] for entry in entries], dtype=np.float32).reshape(-1, N_MFCC, MAX_LEN),
+                embeddings=(np.array(embeddings, dtype=np.float32) if all(e is not None for e in embeddings)
+                            else np.zeros((0, EMBEDDING_DIM), dtype=np.float32)),
+            )
+        os.replace(tmp_path, path)
+
+    def _compute(self, path, signature, digest):
+        features = AudioFeatures.from_file(path)
+        return {
+            "signature": signature,
+            "hash": digest,
+            "mel": features.mel_db_mean.astype(np.float32),
+            "mfcc": features.mfcc_fixed(MAX_LEN).astype(np.float32),
+            "embedding": np.asarray(self.embed_fn(path), dtype=np.float32) if self.embed_fn else None,
+        }
+
+    def refresh(self):
+        """
+        Rescan the directory. Returns (updated, removed) file names and
+        persists the index when anything changed.
+        """
+        with self._refresh_lock:
+            with self._lock:
+                entries = dict(self._entries)
+            found = {}
+            for entry in os.scandir(self.directory) if os.path.isdir(self.directory) else []:
+                if entry.is_file() and entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                    st = entry.stat()
+                    found[entry.name] = (entry.path, (st.st_mtime_ns, st.st_size))
+
+            updated, touched = [], False
+            for name, (path, signature) in found.items():
+                current = entries.get(name)
+                if current is not None and current["signature"] == signature:
+                    continue
+                try:
+                    digest = content_hash(path)
+                    if current is not None and current["hash"] == digest and (
+                            current["embedding"] is not None or self.embed_fn is None):
+                        # Touched or copied over with identical content
+                        entries[name] = dict(current, signature=signature)
+                        touched = True
+                    else:
+                        entries[name] = self._compute(path, signature, digest)
+                        updated.append(name)
+                except Exception as e:
+                    print(f"Error indexing {path}: {e}")
+            removed = [name for name in entries if name not in found]
+            for name in removed:
+                del entries[name]
+
+            with self._lock:
+                self._entries = entries
+                self._scanned = True
+            if (updated or removed or touched) and self.index_path:
+                self.save()
+            if updated or removed:
+                print(f"Sample index: {len(updated)} updated, {len(removed)} removed, {len(entries)} total")
+            return updated, removed
+
+    def watch(self):
+        # Background rescans, one thread per process: a thread started before
+        # a fork does not run in the forked workers
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._thread = threading.Thread(target=self._run, name="sample-index", daemon=True)
+                    self._thread.start()
+                    self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Sample index refresh failed: {e}")
+            time.sleep(self.poll_interval)
+
+    def get(self, name):
+        """
+        Entry for one file name, or None if it is not in the directory.
+        Served from the persisted index while the first scan runs in the
+        background; only a name the index doesn't have waits for that scan.
+        """
+        self.watch()
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None and not self._scanned:
+            self.refresh()
+            with self._lock:
+                entry = self._entries.get(name)
+        return entry
+
+    def names(self):
+        with self._lock:
+            return sorted(self._entries)
+
+    def compare(self, snapshot, atol=1e-4):
+        """
+        Differences between this index and another one (e.g. a stored
+        snapshot) as a list of (name, problem) pairs; empty when they agree.
+        """
+        problems = []
+        with self._lock:
+            entries = dict(self._entries)
+        for name in sorted(set(entries) | set(snapshot._entries)):
+            mine, theirs = entries.get(name), snapshot._entries.get(name)
+            if mine is None or theirs is None:
+                problems.append((name, "missing from index" if mine is None else "missing from snapshot"))
+                continue
+            if mine["hash"] != theirs["hash"]:
+                problems.append((name, "file content changed"))
+                continue
+            for key in ("mel", "mfcc", "embedding"):
+                if mine[key] is None or theirs[key] is None:
+                    continue
+                diff = float(np.abs(mine[key] - theirs[key]).max())
+                if diff > atol:
+                    problems.append((name, f"{key} differs by {diff:.2e}"))
+        return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a sample feature index or check it against a snapshot")
+    parser.add_argument("directory")
+    parser.add_argument("--index", default=INDEX_PATH, help="index file to build or update")
+    parser.add_argument("--check", help="snapshot index to compare freshly computed features with")
+    parser.add_argument("--atol", type=float, default=1e-4)
+    parser.add_argument("--speaker", action="store_true", help="also store speaker embeddings (loads SpeechBrain)")
+    args = parser.parse_args(argv)
+
+    embed_fn = None
+    if args.speaker:
+        from same_voice import embed_sample as embed_fn
+
+    if args.check:
+        # Recompute everything from scratch, without touching the snapshot
+        index = SampleIndex(args.directory, index_path=None, embed_fn=embed_fn)
+        index.refresh()
+        problems = index.compare(SampleIndex(args.directory, index_path=args.check), atol=args.atol)
+        for name, problem in problems:
+            print(f"{name}: {problem}")
+        print(f"{len(index.names())} samples, {len(problems)} problems")
+        return 1 if problems else 0
+
+    index = SampleIndex(args.directory, index_path=args.index, embed_fn=embed_fn)
+    index.refresh()
+    print(f"Indexed {len(index.names())} samples into {args.index}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,51 +1,70 @@
 import os
-import librosa
 import numpy as np
 import joblib
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, precision_recall_curve
-from sklearn.preprocessing import StandardScaler
 import matplotlib.pyplot as plt
-from tqdm import tqdm
+
+from .audio_io import load_audio
+from .dataset import DATASET_DIR, build_dataset, fit_scaler, predict_proba_chunked, transform_to_memmap
+from .feature_cache import FeatureCache
+from .features import N_MFCC, AudioFeatures
+from .forest import COMPILED_MODEL_PATH, check_parity, export_forest
+from .vad import trim_silence
+
+# Run from server/ with: python -m voice_classification.train
 
 MAX_LEN = 130
 LABELS = {'real': 0, 'fake': 1}
-MODEL_PATH = "voice_classifier.pkl"
-SCALER_PATH = "scaler.pkl"
+# Next to this module, where VoiceClassifier loads them from, whatever the working directory
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(MODEL_DIR, "voice_classifier.pkl")
+SCALER_PATH = os.path.join(MODEL_DIR, "scaler.pkl")
+TRAINING_DIR = os.path.join(MODEL_DIR, "training")
+VALIDATION_DIR = os.path.join(MODEL_DIR, "validation")
+TESTING_DIR = os.path.join(MODEL_DIR, "testing")
 RANDOM_SEED = 42
 CUSTOM_THRESHOLD = 0.3 
+USE_VAD = False  # keep in sync with USE_VAD in voice_classifier.py
+WORKERS = None  # feature extraction processes, None = one per CPU
+# Cached features are only reused for identical extraction settings
+FEATURE_NAMESPACE = f"mfcc{N_MFCC}_len{MAX_LEN}_vad{int(USE_VAD)}"
 
 def extract_features(file_path, max_len=MAX_LEN):
     try:
-        audio, sr = librosa.load(file_path, sr=None)
-        mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=40)
-        if mfcc.shape[1] < max_len:
-            pad_width = max_len - mfcc.shape[1]
-            mfcc = np.pad(mfcc, pad_width=((0, 0), (0, pad_width)), mode='constant')
-        else:
-            mfcc = mfcc[:, :max_len]
-        return mfcc
+        audio, sr = load_audio(file_path, sr=None)
+        if USE_VAD:
+            audio, _ = trim_silence(audio, sr)
+        return AudioFeatures(audio, sr).mfcc_fixed(max_len)
     except Exception as e:
         print(f"Failed to process {file_path}: {e}")
         return None
 
-def load_data(folder_path):
+def load_data(folder_path, cache=None):
+    """
+    Extract a split into a memory-mapped dataset under DATASET_DIR.
+    Returns (X, y) where X is a read-only (N, N_MFCC * MAX_LEN) float32 memmap.
+    """
     print(f"\nLoading data from: {folder_path}")
-    X, y = [], []
+    if cache is None:
+        cache = FeatureCache((N_MFCC, MAX_LEN), FEATURE_NAMESPACE)
+    paths, labels = [], []
     for label_name in ['real', 'fake']:
         class_folder = os.path.join(folder_path, label_name)
         if not os.path.isdir(class_folder):
             print(f"Warning: {class_folder} not found.")
             continue
-        files = [f for f in os.listdir(class_folder) if f.endswith('.wav') or f.endswith('.mp3')]
-        print(f"Processing '{label_name}' files ({len(files)} files)...")
-        for file in tqdm(files, desc=f"  - {label_name}"):
-            full_path = os.path.join(class_folder, file)
-            features = extract_features(full_path)
-            if features is not None:
-                X.append(features)
-                y.append(LABELS[label_name])
-    return np.array(X), np.array(y)
+        # Sorted so the sample order (and the trained forest) is reproducible
+        files = sorted(f for f in os.listdir(class_folder) if f.endswith('.wav') or f.endswith('.mp3'))
+        print(f"Found '{label_name}' files ({len(files)} files)...")
+        paths.extend(os.path.join(class_folder, file) for file in files)
+        labels.extend([LABELS[label_name]] * len(files))
+
+    name = f"{os.path.basename(os.path.normpath(folder_path))}_{FEATURE_NAMESPACE}"
+    X, y = build_dataset(name, paths, labels, extract_features, (N_MFCC, MAX_LEN),
+                         cache=cache, workers=WORKERS, desc=f"  - {folder_path}")
+    print(f"Extracted {len(X)} of {len(paths)} files")
+    return X, y
 
 def plot_precision_recall(y_true, y_proba):
     precision, recall, thresholds = precision_recall_curve(y_true, y_proba)
@@ -61,36 +80,52 @@ def plot_precision_recall(y_true, y_proba):
 def train_model():
     print("\nStarting training process...")
 
-    X_train, y_train = load_data("training")
-    X_val, y_val = load_data("validation")
-    X_test, y_test = load_data("testing")
-
-    print("\nReshaping feature arrays...")
-    X_train = X_train.reshape(len(X_train), -1)
-    X_val = X_val.reshape(len(X_val), -1)
-    X_test = X_test.reshape(len(X_test), -1)
+    cache = FeatureCache((N_MFCC, MAX_LEN), FEATURE_NAMESPACE)
+    X_train, y_train = load_data(TRAINING_DIR, cache)
+    X_val, y_val = load_data(VALIDATION_DIR, cache)
+    X_test, y_test = load_data(TESTING_DIR, cache)
 
+    # Features are already flat rows on disk; the scaler is fitted chunk by
+    # chunk and the scaled copies are written to memory maps as well, so
+    # peak RAM stays at a chunk rather than several copies of the dataset.
     print("\nNormalizing features...")
-    scaler = StandardScaler()
-    X_train = scaler.fit_transform(X_train)
-    X_val = scaler.transform(X_val)
-    X_test = scaler.transform(X_test)
+    scaler = fit_scaler(X_train)
+    X_train = transform_to_memmap(X_train, scaler, os.path.join(DATASET_DIR, "scaled_train.npy"))
+    X_val = transform_to_memmap(X_val, scaler, os.path.join(DATASET_DIR, "scaled_val.npy"))
+    X_test = transform_to_memmap(X_test, scaler, os.path.join(DATASET_DIR, "scaled_test.npy"))
 
     print("\nTraining Random Forest model...")
     model = RandomForestClassifier(random_state=RANDOM_SEED)
     model.fit(X_train, y_train)
 
-    print(f"\nSaving model to: {MODEL_PATH}")
-    joblib.dump(model, MODEL_PATH)
-    print(f"Saving scaler to: {SCALER_PATH}")
-    joblib.dump(scaler, SCALER_PATH)
+    # Everything is written and checked off to the side first, so a failed
+    # export or parity check leaves the served model, scaler and compiled
+    # forest untouched
+    staged = {path: f"{path}.{os.getpid()}.tmp" for path in (MODEL_PATH, SCALER_PATH, COMPILED_MODEL_PATH)}
+    try:
+        joblib.dump(model, staged[MODEL_PATH])
+        joblib.dump(scaler, staged[SCALER_PATH])
+        compiled = export_forest(model, staged[COMPILED_MODEL_PATH])
+        parity_rows = X_test if len(X_test) else X_train[:1000]
+        max_diff = check_parity(model, compiled, parity_rows)
+        print(f"Compiled forest matches sklearn on {len(parity_rows)} rows (max diff {max_diff:.2e})")
+    except Exception:
+        for tmp_path in staged.values():
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+    # The compiled forest goes last: the server ignores an .npz older than the pickle
+    for path in (MODEL_PATH, SCALER_PATH, COMPILED_MODEL_PATH):
+        os.replace(staged[path], path)
+        print(f"Saved {path}")
+
+    y_proba = predict_proba_chunked(model, X_test)
 
     print("\n=== Test Results (Default Threshold: 0.5) ===")
-    y_pred_default = model.predict(X_test)
+    y_pred_default = model.classes_[np.argmax(y_proba, axis=1)]
     print(classification_report(y_test, y_pred_default, target_names=["Human", "AI"]))
 
     print(f"\n=== Test Results (Custom Threshold: {CUSTOM_THRESHOLD}) ===")
-    y_proba = model.predict_proba(X_test)
     y_pred_custom = (y_proba[:, 1] >= CUSTOM_THRESHOLD).astype(int)
     print(classification_report(y_test, y_pred_custom, target_names=["Human", "AI"]))
 
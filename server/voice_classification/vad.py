@@ -0,0 +1,83 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+FRAME_SECONDS = 0.025
+HOP_SECONDS = 0.010
+RELATIVE_DB = -35.0  # frames this far below the loudest frame are silence
+FLOOR_DB = -55.0  # absolute floor in dBFS
+FLATNESS_MAX = 0.45  # spectral flatness above this looks like noise, not voice
+MIN_SPEECH_SECONDS = 0.10  # shorter bursts are dropped
+MIN_SILENCE_SECONDS = 0.20  # shorter pauses inside speech are kept
+PAD_SECONDS = 0.05  # context kept on both sides of each region
+
+
+def speech_frames(audio, sr, frame_seconds=FRAME_SECONDS, hop_seconds=HOP_SECONDS,
+                  relative_db=RELATIVE_DB, floor_db=FLOOR_DB, flatness_max=FLATNESS_MAX):
+    """
+    Per-frame speech mask from frame energy and spectral flatness.
+    relative_db=None disables the threshold relative to the loudest frame,
+    e.g. for short streamed chunks. Returns (mask, frame_length, hop_length).
+    """
+    frame = max(1, int(frame_seconds * sr))
+    hop = max(1, int(hop_seconds * sr))
+    if len(audio) < frame:
+        return np.zeros(0, dtype=bool), frame, hop
+
+    frames = sliding_window_view(audio, frame)[::hop] * np.hanning(frame).astype(np.float32)
+    power = np.mean(frames ** 2, axis=1)
+    energy_db = 10 * np.log10(power + 1e-10)
+
+    spectrum = np.abs(np.fft.rfft(frames, axis=1)) ** 2 + 1e-10
+    flatness = np.exp(np.mean(np.log(spectrum), axis=1)) / np.mean(spectrum, axis=1)
+
+    gate = floor_db
+    if relative_db is not None:
+        gate = max(gate, float(energy_db.max()) + relative_db)
+    return (energy_db > gate) & (flatness < flatness_max), frame, hop
+
+
+def detect_speech(audio, sr, min_speech_seconds=MIN_SPEECH_SECONDS,
+                  min_silence_seconds=MIN_SILENCE_SECONDS, pad_seconds=PAD_SECONDS, **frame_options):
+    """
+    Speech regions of a mono signal as a list of (start, end) sample indices.
+    frame_options are passed to speech_frames().
+    """
+    mask, frame, hop = speech_frames(audio, sr, **frame_options)
+    if not mask.any():
+        return []
+
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    # Bridge short pauses, then drop short bursts (all in frame units)
+    gaps = starts[1:] - ends[:-1]
+    keep = np.concatenate([[True], gaps >= min_silence_seconds * sr / hop])
+    starts = starts[keep]
+    ends = ends[np.concatenate([keep[1:], [True]])]
+    long_enough = (ends - starts) * hop >= min_speech_seconds * sr
+    starts, ends = starts[long_enough], ends[long_enough]
+
+    pad = int(pad_seconds * sr)
+    start_samples = np.maximum(starts * hop - pad, 0)
+    end_samples = np.minimum((ends - 1) * hop + frame + pad, len(audio))
+
+    segments = []
+    for start, end in zip(start_samples.tolist(), end_samples.tolist()):
+        if segments and start <= segments[-1][1]:
+            segments[-1] = (segments[-1][0], max(end, segments[-1][1]))
+        else:
+            segments.append((start, end))
+    return segments
+
+
+def trim_silence(audio, sr, **options):
+    """
+    Keep only the speech regions of a signal.
+    Returns (speech_audio, segments); when no speech is found the signal is
+    returned unchanged with an empty segment list.
+    """
+    segments = detect_speech(audio, sr, **options)
+    if not segments:
+        return audio, []
+    return np.concatenate([audio[start:end] for start, end in segments]), segments
@@ -1,51 +1,219 @@
-import librosa
+import os
+import sys
+import threading
+import time
+
 import numpy as np
 import joblib
 
+from .audio_io import load_audio
+from .features import AudioFeatures
+from .feature_cache import content_hash
+from .forest import COMPILED_MODEL_PATH, CompiledForest
+from .result_cache import ResultCache, bytes_hash
+from .vad import trim_silence
+
 MAX_LEN = 130
 CUSTOM_THRESHOLD = 0.3
 MODEL_PATH = "voice_classifier.pkl"
 SCALER_PATH = "scaler.pkl"
+RELOAD_CHECK_INTERVAL = 2.0  # seconds between stat() checks of the pickles
+# Trim silence before the MFCC. Must match USE_VAD in train.py, so only turn
+# it on together with a model retrained on trimmed audio.
+USE_VAD = False
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def mfcc_features(audio, sr, max_len=MAX_LEN):
+    return AudioFeatures(audio, sr).mfcc_fixed(max_len)
 
 def extract_features(file_path, max_len=MAX_LEN):
     try:
-        audio, sr = librosa.load(file_path, sr=None)
-        mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=40)
-        if mfcc.shape[1] < max_len:
-            pad_width = max_len - mfcc.shape[1]
-            mfcc = np.pad(mfcc, pad_width=((0, 0), (0, pad_width)), mode='constant')
-        else:
-            mfcc = mfcc[:, :max_len]
-        return mfcc
+        audio, sr = load_audio(file_path, sr=None)
+        if USE_VAD:
+            audio, _ = trim_silence(audio, sr)
+        return mfcc_features(audio, sr, max_len)
     except Exception as e:
         print(f"Error processing {file_path}: {e}")
         return None
 
-def is_human(audio_file):
-    try:
-        model = joblib.load(MODEL_PATH)
-        scaler = joblib.load(SCALER_PATH)
-    except Exception as e:
-        print(f"Failed to load model or scaler: {e}")
-        return
+def _file_signature(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
 
-    features = extract_features(audio_file)
+class VoiceClassifier:
+    """
+    Model and scaler loaded once and shared across requests.
 
-    if features is None:
-        print("Feature extraction failed.")
-        return
+    The compiled forest exported by train.py is used when present and not
+    older than the pickle (smaller, faster to load and to evaluate),
+    otherwise the sklearn pickle. The files
+    are stat()ed at most every RELOAD_CHECK_INTERVAL seconds. When one
+    changes on disk the pair is loaded again off to the side and swapped in
+    as a single tuple, so a request never sees a new model with an old
+    scaler and in-flight predictions keep the pair they started with.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, scaler_path=SCALER_PATH,
+                 threshold=CUSTOM_THRESHOLD, check_interval=RELOAD_CHECK_INTERVAL,
+                 compiled_path=COMPILED_MODEL_PATH):
+        self.model_path = os.path.join(MODEL_DIR, model_path)
+        self.scaler_path = os.path.join(MODEL_DIR, scaler_path)
+        self.compiled_path = os.path.join(MODEL_DIR, compiled_path) if compiled_path else None
+        self.threshold = threshold
+        self.check_interval = check_interval
+        self._loaded = None  # (signature, model, scaler)
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _active_model_path(self):
+        if self.compiled_path and os.path.exists(self.compiled_path):
+            # An .npz older than the pickle was left behind by a training run
+            # that failed after saving the pickle; it doesn't match the scaler
+            if (not os.path.exists(self.model_path)
+                    or os.stat(self.compiled_path).st_mtime_ns >= os.stat(self.model_path).st_mtime_ns):
+                return self.compiled_path
+        return self.model_path
+
+    def _signature(self):
+        model_path = self._active_model_path()
+        return (model_path, _file_signature(model_path), _file_signature(self.scaler_path))
+
+    def load(self):
+        with self._lock:
+            signature = self._signature()
+            if self._loaded is None or self._loaded[0] != signature:
+                model_path = signature[0]
+                if model_path == self.compiled_path:
+                    model = CompiledForest.load(model_path)
+                else:
+                    model = joblib.load(model_path)
+                scaler = joblib.load(self.scaler_path)
+                self._loaded = (signature, model, scaler)
+                print(f"Loaded voice classifier from {model_path}")
+            self._last_check = time.monotonic()
+            return self._loaded
+
+    def _current(self):
+        loaded = self._loaded
+        if loaded is None:
+            return self.load()
+        if time.monotonic() - self._last_check >= self.check_interval:
+            try:
+                if self._signature() != loaded[0]:
+                    return self.load()
+                self._last_check = time.monotonic()
+            except Exception as e:
+                # Keep serving the loaded pair while the files are being replaced
+                print(f"Voice classifier reload failed: {e}")
+                self._last_check = time.monotonic()
+        return loaded
 
-    features = features.reshape(1, -1)
+    @property
+    def version(self):
+        return self._current()[0]
 
-    features_normalized = scaler.transform(features)
+    def predict_proba(self, features):
+        """
+        AI probabilities for a batch of MFCC matrices (or flattened rows).
+        """
+        _, model, scaler = self._current()
+        features = np.asarray(features)
+        features = features.reshape(len(features), -1)
+        return model.predict_proba(scaler.transform(features))[:, 1]
 
-    proba = model.predict_proba(features_normalized)
-    ai_probability = proba[0][1]
+    def predict(self, features):
+        """
+        Classify one MFCC matrix; returns (label, ai_probability).
+        """
+        ai_probability = float(self.predict_proba(np.asarray(features)[np.newaxis])[0])
+        label = "AI" if ai_probability >= self.threshold else "Human"
+        return label, ai_probability
+
+classifier = VoiceClassifier()
+result_cache = ResultCache("voice_classifier")
+
+def _input_hash(audio_file):
+    if isinstance(audio_file, AudioFeatures):
+        audio_file = (audio_file.audio, audio_file.sr)
+    if isinstance(audio_file, tuple):
+        audio, sr = audio_file
+        return bytes_hash(np.ascontiguousarray(audio).tobytes() + str(sr).encode())
+    if isinstance(audio_file, (bytes, bytearray)):
+        return bytes_hash(audio_file)
+    return content_hash(audio_file)
+
+def classify(audio_file, threshold=None):
+    """
+    Run the deepfake classifier once over an audio file, raw audio bytes, an
+    already decoded (audio, sr) pair or an AudioFeatures shared with other
+    models for the same request.
+    Decodes and computes the MFCC a single time and returns a dict with the
+    label, AI probability, threshold used and per-stage timings in ms.
+    """
+    threshold = classifier.threshold if threshold is None else threshold
+    timings = {}
+
+    start = time.perf_counter()
+    # Retries and replayed clips are answered from the cache; a reloaded model starts it over
+    result_cache.set_version(classifier.version)
+    cache_key = result_cache.key(_input_hash(audio_file), threshold, USE_VAD)
+    hit, cached = result_cache.get(cache_key)
+    if hit:
+        return dict(cached, cached=True, timings={'total_ms': (time.perf_counter() - start) * 1000})
+
+    # Native sample rate, as in training
+    if isinstance(audio_file, AudioFeatures):
+        shared = audio_file
+    elif isinstance(audio_file, tuple):
+        shared = AudioFeatures(*audio_file)
+    elif isinstance(audio_file, (bytes, bytearray)):
+        shared = AudioFeatures.from_bytes(audio_file)
+    else:
+        shared = AudioFeatures.from_file(audio_file)
+    timings['decode_ms'] = (time.perf_counter() - start) * 1000
+
+    segments = None
+    if USE_VAD:
+        stage = time.perf_counter()
+        audio, segments = trim_silence(shared.audio, shared.sr)
+        shared = AudioFeatures(audio, shared.sr)
+        timings['vad_ms'] = (time.perf_counter() - stage) * 1000
+
+    stage = time.perf_counter()
+    features = shared.mfcc_fixed(MAX_LEN)
+    timings['features_ms'] = (time.perf_counter() - stage) * 1000
+
+    stage = time.perf_counter()
+    ai_probability = float(classifier.predict_proba(features[np.newaxis])[0])
+    timings['model_ms'] = (time.perf_counter() - stage) * 1000
+    timings['total_ms'] = (time.perf_counter() - start) * 1000
+
+    label = "AI" if ai_probability >= threshold else "Human"
+    result = {
+        'label': label,
+        'is_human': label == "Human",
+        'ai_probability': ai_probability,
+        'threshold': threshold,
+        'speech_segments': [[int(s), int(e)] for s, e in segments] if segments is not None else None,
+        'cached': False,
+        'timings': timings,
+    }
+    result_cache.put(cache_key, {key: value for key, value in result.items() if key not in ('cached', 'timings')})
+    return result
+
+def is_human(audio_file):
+    try:
+        result = classify(audio_file)
+    except Exception as e:
+        print(f"Error processing {audio_file}: {e}")
+        return
 
-    print(f"Probability for AI: {ai_probability:.2f}")
-    label = "AI" if ai_probability >= CUSTOM_THRESHOLD else "Human"    
-    print(f"Classification result: {label}")
+    print(f"Probability for AI: {result['ai_probability']:.2f}")
+    print(f"Classification result: {result['label']}")
 
-    return True if label == "Human" else False
+    return result['is_human']
 
-is_human("model.wav")
\ No newline at end of file
+if __name__ == "__main__":
+    # Run from server/ with: python -m voice_classification.voice_classifier model.wav
+    is_human(sys.argv[1] if len(sys.argv) > 1 else "model.wav")